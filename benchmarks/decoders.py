@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares the event decoding throughput of the :class:`BitPackedDecoder` with
+the integer cursor :class:`FastBitPackedDecoder`.
+
+    PYTHONPATH=. python benchmarks/decoders.py [--repeat N] [PATH..]
+
+Every replay found under the given paths (``test_replays`` by default) is
+loaded up to its details, then each of its event streams is decoded with both
+decoders. Only the time spent inside the readers is counted.
+"""
+from __future__ import absolute_import, print_function, unicode_literals, division
+
+import argparse
+from collections import defaultdict
+from timeit import default_timer
+
+import sc2reader
+from sc2reader import utils
+
+STREAMS = ["replay.game.events", "replay.tracker.events", "replay.message.events"]
+
+
+def count_events(result):
+    if isinstance(result, dict):
+        return sum(len(events) for events in result.values())
+    return len(result)
+
+
+def time_reader(reader, data, replay, repeat):
+    best = None
+    for i in range(repeat):
+        start = default_timer()
+        result = reader(data, replay)
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count_events(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the bit packed decoders on a replay corpus."
+    )
+    parser.add_argument(
+        "--repeat",
+        default=3,
+        type=int,
+        help="Number of times to decode each stream, the best time is kept.",
+    )
+    parser.add_argument(
+        "paths", metavar="path", type=str, nargs="*", default=["test_replays"]
+    )
+    args = parser.parse_args()
+
+    seconds = defaultdict(lambda: defaultdict(float))
+    events = defaultdict(int)
+    for path in args.paths:
+        for filename in utils.get_files(path, extension="SC2Replay"):
+            try:
+                replay = sc2reader.load_replay(filename, load_level=1)
+            except Exception as e:
+                print("Skipping {0}: {1}".format(filename, e))
+                continue
+
+            for data_file in STREAMS:
+                data = utils.extract_data_file(data_file, replay.archive)
+                if not data:
+                    continue
+
+                reader = replay._get_reader(data_file)
+                for fast_decoder in (False, True):
+                    replay.opt["fast_decoder"] = fast_decoder
+                    elapsed, count = time_reader(reader, data, replay, args.repeat)
+                    seconds[data_file][fast_decoder] += elapsed
+                events[data_file] += count
+
+    print(
+        "{0:<24}{1:>10}{2:>16}{3:>16}{4:>10}".format(
+            "stream", "events", "classic ev/s", "fast ev/s", "speedup"
+        )
+    )
+    for data_file in STREAMS:
+        if not events[data_file]:
+            continue
+        classic = events[data_file] / seconds[data_file][False]
+        fast = events[data_file] / seconds[data_file][True]
+        print(
+            "{0:<24}{1:>10}{2:>16.0f}{3:>16.0f}{4:>9.2f}x".format(
+                data_file, events[data_file], classic, fast, fast / classic
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -45,9 +45,12 @@ def setFactory(factory):
         * sc2reader.load_replay(s)
         * sc2reader.load_map(s)
         * sc2reader.load_game_summar(y|ies)
+        * sc2reader.scan_header
+        * sc2reader.scan_replays
         * sc2reader.configure
         * sc2reader.reset
         * sc2reader.register_plugin
+        * sc2reader.use_parsed_cache
 
     These methods when called will delegate to the factory for execution.
     """
@@ -58,11 +61,14 @@ def setFactory(factory):
     module.load_map = factory.load_map
     module.load_game_summaries = factory.load_game_summaries
     module.load_game_summary = factory.load_game_summary
+    module.scan_header = factory.scan_header
+    module.scan_replays = factory.scan_replays
 
     module.configure = factory.configure
     module.reset = factory.reset
 
     module.register_plugin = factory.register_plugin
+    module.use_parsed_cache = factory.use_parsed_cache
     module._defaultFactory = factory
 
 
@@ -107,6 +107,10 @@ SUBREGIONS = {
 import json
 import pkgutil
 
+# Imported rather than left to pkgutil, which loads the package without
+# adding it to sc2reader and breaks a later "import sc2reader.data".
+import sc2reader.data  # noqa: F401
+
 attributes_json = pkgutil.get_data("sc2reader.data", "attributes.json").decode("utf8")
 attributes_dict = json.loads(attributes_json)
 LOBBY_PROPERTIES = dict()
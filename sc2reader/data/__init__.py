@@ -1,14 +1,25 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function, unicode_literals, division
 
+import hashlib
 import json
+import logging
+import operator
+import os
+import pickle
 import pkgutil
+import zlib
 
 try:
     from collections import OrderedDict
 except ImportError as e:
     from ordereddict import OrderedDict
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 from sc2reader.log_utils import loggable
 
 try:
@@ -16,28 +27,34 @@ try:
 except NameError:
     cmp = lambda a, b: (a > b) - (a < b)  # noqa Python 3
 
+ability_lookup_data = pkgutil.get_data("sc2reader.data", "ability_lookup.csv")
+unit_lookup_data = pkgutil.get_data("sc2reader.data", "unit_lookup.csv")
+unit_info_data = pkgutil.get_data("sc2reader.data", "unit_info.json")
+train_commands_data = pkgutil.get_data("sc2reader.data", "train_commands.json")
+
+#: A hash of the data shared by all builds
+LOOKUP_DIGEST = hashlib.sha1(
+    ability_lookup_data + unit_lookup_data + unit_info_data + train_commands_data
+).digest()
+
 ABIL_LOOKUP = dict()
-for entry in (
-    pkgutil.get_data("sc2reader.data", "ability_lookup.csv").decode("utf8").split("\n")
-):
+for entry in ability_lookup_data.decode("utf8").split("\n"):
     if not entry:
         continue
     str_id, abilities = entry.split(",", 1)
     ABIL_LOOKUP[str_id] = abilities.split(",")
 
 UNIT_LOOKUP = dict()
-for entry in (
-    pkgutil.get_data("sc2reader.data", "unit_lookup.csv").decode("utf8").split("\n")
-):
+for entry in unit_lookup_data.decode("utf8").split("\n"):
     if not entry:
         continue
     str_id, title = entry.strip().split(",")
     UNIT_LOOKUP[str_id] = title
 
-unit_data = pkgutil.get_data("sc2reader.data", "unit_info.json").decode("utf8")
+unit_data = unit_info_data.decode("utf8")
 unit_lookup = json.loads(unit_data)
 
-command_data = pkgutil.get_data("sc2reader.data", "train_commands.json").decode("utf8")
+command_data = train_commands_data.decode("utf8")
 train_commands = json.loads(command_data)
 
 
@@ -356,13 +373,8 @@ class Build(object):
         build_time=None,
         build_unit=None,
     ):
-        ability = Ability(
-            ability_id,
-            name=name,
-            title=title or name,
-            is_build=is_build,
-            build_time=build_time,
-            build_unit=build_unit,
+        ability = get_shared(
+            Ability, ability_id, name, title or name, is_build, build_time, build_unit
         )
         setattr(self, name, ability)
         self.abilities[ability_id] = ability
@@ -381,51 +393,134 @@ class Build(object):
         is_worker=False,
         is_army=False,
     ):
-        unit = UnitType(
+        unit = get_shared(
+            UnitType,
             type_id,
-            str_id=str_id,
-            name=name,
-            title=title or name,
-            race=race,
-            minerals=minerals,
-            vespene=vespene,
-            supply=supply,
-            is_building=is_building,
-            is_worker=is_worker,
-            is_army=is_army,
+            str_id,
+            name,
+            title or name,
+            race,
+            minerals,
+            vespene,
+            supply,
+            is_building,
+            is_worker,
+            is_army,
         )
         setattr(self, name, unit)
         self.units[type_id] = unit
         self.units[str_id] = unit
 
 
+#: The unit types and abilities of all builds by id and name. Most of them
+#: are the same from one build to the next, so builds share the instances.
+_shared = dict()
+
+
+def get_shared(cls, *values):
+    """
+    Returns an instance of the :class:`UnitType` or :class:`Ability` class
+    made from the given constructor arguments, shared with the other builds
+    that have one with exactly the same values. Shared instances must not
+    be changed.
+    """
+    key = (cls, values[0], values[1])
+    instance = _shared.get(key)
+    if instance is None or _shared_values[cls](instance) != values:
+        instance = cls(*values)
+        _shared.setdefault(key, instance)
+    return instance
+
+
+_shared_values = {
+    UnitType: operator.attrgetter(
+        "id",
+        "str_id",
+        "name",
+        "title",
+        "race",
+        "minerals",
+        "vespene",
+        "supply",
+        "is_building",
+        "is_worker",
+        "is_army",
+    ),
+    Ability: operator.attrgetter(
+        "id", "name", "title", "is_build", "build_time", "build_unit"
+    ),
+}
+
+
 def load_build(expansion, version):
-    build = Build(version)
+    """
+    Returns a new :class:`Build` from the data files of the given version,
+    using the precompiled tables when they are up to date.
+    """
+    unit_data, abil_data = get_build_data(expansion, version)
+    digest = get_build_digest(unit_data, abil_data)
+    tables = get_compiled_tables(expansion, version, digest)
+    if tables is None:
+        tables = parse_build_tables(unit_data, abil_data)
+    return create_build(version, *tables)
 
+
+def get_build_data(expansion, version):
     unit_file = "{0}/{1}_units.csv".format(expansion, version)
-    for entry in (
-        pkgutil.get_data("sc2reader.data", unit_file).decode("utf8").split("\n")
-    ):
+    abil_file = "{0}/{1}_abilities.csv".format(expansion, version)
+    return (
+        pkgutil.get_data("sc2reader.data", unit_file),
+        pkgutil.get_data("sc2reader.data", abil_file),
+    )
+
+
+def get_build_digest(unit_data, abil_data):
+    """Returns a hash of everything the tables of a build are made from."""
+    digest = hashlib.sha1(LOOKUP_DIGEST)
+    digest.update(unit_data)
+    digest.update(abil_data)
+    return digest.hexdigest()
+
+
+def parse_build_tables(unit_data, abil_data):
+    """
+    Returns the unit type and ability tables of a build as lists of
+    arguments to :meth:`Build.add_unit_type` and :meth:`Build.add_ability`.
+    """
+    units = list()
+    for entry in unit_data.decode("utf8").split("\n"):
         if not entry:
             continue
         int_id, str_id = entry.strip().split(",")
         unit_type = int(int_id, 10)
         title = UNIT_LOOKUP[str_id]
 
-        values = dict(type_id=unit_type, str_id=str_id, name=title)
+        values = dict(race="Neutral")
         for race in ("Protoss", "Terran", "Zerg"):
             if title.lower() in unit_lookup[race]:
                 values.update(unit_lookup[race][title.lower()])
                 values["race"] = race
                 break
 
-        build.add_unit_type(**values)
+        units.append(
+            (
+                unit_type,
+                str_id,
+                title,
+                None,
+                values["race"],
+                values.get("minerals", 0),
+                values.get("vespene", 0),
+                values.get("supply", 0),
+                values.get("is_building", False),
+                values.get("is_worker", False),
+                values.get("is_army", False),
+            )
+        )
 
-    abil_file = "{0}/{1}_abilities.csv".format(expansion, version)
-    build.add_ability(ability_id=0, name="RightClick", title="Right Click")
-    for entry in (
-        pkgutil.get_data("sc2reader.data", abil_file).decode("utf8").split("\n")
-    ):
+    # Build units are named rather than referenced, see create_build
+    abilities = [(0, "RightClick", "Right Click", False, None, "")]
+    for entry in abil_data.decode("utf8").split("\n"):
         if not entry:
             continue
         int_id_base, str_id = entry.strip().split(",")
@@ -444,44 +539,178 @@ def load_build(expansion, version):
             ):  # Not really sure how to handle hallucinations
                 unit_name = unit_name[12:]
 
-            build.add_ability(
-                ability_id=int_id_base | index,
-                name=ability_name,
-                is_build=bool(unit_name),
-                build_unit=getattr(build, unit_name, None),
-                build_time=build_time,
+            abilities.append(
+                (
+                    int_id_base | index,
+                    ability_name,
+                    None,
+                    bool(unit_name),
+                    build_time,
+                    unit_name,
+                )
             )
 
+    return units, abilities
+
+
+def create_build(version, units, abilities):
+    build = Build(version)
+    for unit in units:
+        build.add_unit_type(*unit)
+    for ability_id, name, title, is_build, build_time, unit_name in abilities:
+        build.add_ability(
+            ability_id,
+            name,
+            title=title,
+            is_build=is_build,
+            build_time=build_time,
+            build_unit=getattr(build, unit_name, None) if unit_name else None,
+        )
     return build
 
 
-# Load the WoL Data
-wol_builds = dict()
-for version in ("16117", "17326", "18092", "19458", "22612", "24944"):
-    wol_builds[version] = load_build("WoL", version)
-
-# Load HotS Data
-hots_builds = dict()
-for version in ("base", "23925", "24247", "24764"):
-    hots_builds[version] = load_build("HotS", version)
-hots_builds["38215"] = load_build("LotV", "base")
-hots_builds["38215"].id = "38215"
-
-# Load LotV Data
-lotv_builds = dict()
-for version in (
-    "base",
-    "44401",
-    "47185",
-    "48258",
-    "53644",
-    "54724",
-    "59587",
-    "70154",
-    "76114",
-    "77379",
-    "80949",
-):
-    lotv_builds[version] = load_build("LotV", version)
+#: The format of the compiled datapack file, bump it on changes to the
+#: layout of the tables.
+COMPILED_FORMAT = 1
+
+#: The file holding the compiled tables of each build, see compile_datapacks
+COMPILED_FILE = "datapacks.bin"
+
+#: The digest and compressed tables of each compiled build by
+#: "expansion/version", read from the compiled file on first use.
+_compiled_builds = None
+
+
+def get_compiled_builds():
+    """
+    Returns the compiled builds index, reading the compiled datapack file
+    the first time. The index is empty if the file is missing or outdated.
+    """
+    global _compiled_builds
+    if _compiled_builds is None:
+        try:
+            compiled = pickle.loads(pkgutil.get_data("sc2reader.data", COMPILED_FILE))
+            if compiled["format"] != COMPILED_FORMAT:
+                raise ValueError("format {0} is outdated".format(compiled["format"]))
+            _compiled_builds = compiled["builds"]
+        except Exception as e:
+            logger = logging.getLogger("sc2reader.data")
+            logger.info("Not using the compiled datapacks: {0}".format(e))
+            _compiled_builds = dict()
+    return _compiled_builds
+
+
+def get_compiled_tables(expansion, version, digest):
+    """
+    Returns the precompiled unit type and ability tables of a build or None
+    if they are missing or weren't compiled from the current data files.
+    """
+    compiled_digest, tables = get_compiled_builds().get(
+        "{0}/{1}".format(expansion, version), (None, None)
+    )
+    if compiled_digest != digest:
+        return None
+    return pickle.loads(zlib.decompress(tables))
+
+
+def compile_datapacks(path=None):
+    """
+    Writes the tables of all known builds to the compiled datapack file,
+    ``sc2reader/data/datapacks.bin`` by default. Run this after changing
+    any of the data files, outdated tables are ignored until then.
+    """
+    builds = dict()
+    for expansion_builds in datapacks.values():
+        for expansion, version in expansion_builds.sources.values():
+            unit_data, abil_data = get_build_data(expansion, version)
+            tables = parse_build_tables(unit_data, abil_data)
+            builds["{0}/{1}".format(expansion, version)] = (
+                get_build_digest(unit_data, abil_data),
+                zlib.compress(pickle.dumps(tables, 2), 9),
+            )
+
+    path = path or os.path.join(os.path.dirname(__file__), COMPILED_FILE)
+    with open(path, "wb") as out:
+        pickle.dump(dict(format=COMPILED_FORMAT, builds=builds), out, 2)
+
+    global _compiled_builds
+    _compiled_builds = None
+
+
+class LazyBuilds(Mapping):
+    """
+    Maps the builds of an expansion to their :class:`Build`, loading each
+    one the first time it is used.
+    """
+
+    def __init__(self, sources):
+        #: The expansion and data version each build is loaded from
+        self.sources = OrderedDict(sources)
+        self.loaded = dict()
+
+    def __getitem__(self, version):
+        if version not in self.loaded:
+            expansion, data_version = self.sources[version]
+            build = load_build(expansion, data_version)
+            build.id = version
+            self.loaded[version] = build
+        return self.loaded[version]
+
+    def __iter__(self):
+        return iter(self.sources)
+
+    def __len__(self):
+        return len(self.sources)
+
+    def lazy(self, version):
+        """
+        Returns a :class:`LazyBuild` for the version, to register as a
+        datapack without loading it.
+        """
+        if version not in self.sources:
+            raise KeyError(version)
+        return LazyBuild(self, version)
+
+
+class LazyBuild(object):
+    """A :class:`Build` that isn't loaded until :meth:`load` is called."""
+
+    def __init__(self, builds, version):
+        self.builds = builds
+        self.version = version
+
+    def load(self):
+        return self.builds[self.version]
+
+
+# The WoL Data
+wol_builds = LazyBuilds(
+    (version, ("WoL", version))
+    for version in ("16117", "17326", "18092", "19458", "22612", "24944")
+)
+
+# HotS Data, the latest HotS build shares the LotV base data
+hots_builds = LazyBuilds(
+    [(version, ("HotS", version)) for version in ("base", "23925", "24247", "24764")]
+    + [("38215", ("LotV", "base"))]
+)
+
+# LotV Data
+lotv_builds = LazyBuilds(
+    (version, ("LotV", version))
+    for version in (
+        "base",
+        "44401",
+        "47185",
+        "48258",
+        "53644",
+        "54724",
+        "59587",
+        "70154",
+        "76114",
+        "77379",
+        "80949",
+    )
+)
 
 datapacks = builds = {"WoL": wol_builds, "HotS": hots_builds, "LotV": lotv_builds}
@@ -3,6 +3,7 @@ from __future__ import absolute_import, print_function, unicode_literals, divisi
 
 from io import BytesIO
 
+import binascii
 import struct
 import functools
 
@@ -147,6 +148,9 @@ class ByteDecoder(object):
 class BitPackedDecoder(object):
     """
     :param contents: The string of file-like object to decode
+    :param lazy_blobs: Return blobs from :meth:`read_struct` as memoryview
+        slices of the contents instead of byte strings. Nothing is copied
+        until the slice is used.
 
     Extends :class:`ByteDecoder`. Always packed BIG_ENDIAN
 
@@ -179,9 +183,15 @@ class BitPackedDecoder(object):
     #: joining bytes when we are not byte aligned.
     _bit_masks = list(zip(_lo_masks, _hi_masks))
 
-    def __init__(self, contents):
+    def __init__(self, contents, lazy_blobs=False):
         self._buffer = ByteDecoder(contents, endian="BIG")
 
+        # Structures are walked directly over the raw contents. The buffers
+        # for that are only made once a structure is read, see _struct_buffers.
+        self._lazy_blobs = lazy_blobs
+        self._struct_data = None
+        self._struct_view = None
+
         # Partially expose the ByteBuffer interface
         self.length = self._buffer.length
         self.tell = self._buffer.tell
@@ -390,46 +400,629 @@ class BitPackedDecoder(object):
         the first byte is used as the type identifier.
         """
         self.byte_align()
-        datatype = ord(self._buffer.read(1)) if datatype is None else datatype
+        struct_data, struct_view = self._struct_buffers()
+        data, index, tail_bits = _read_struct(
+            struct_data, self.tell(), datatype, struct_view
+        )
+        self._buffer.seek(index)
+        if tail_bits:
+            self._next_byte = struct_data[index - 1]
+            self._bit_shift = tail_bits
+        return data
 
-        if datatype == 0x00:  # array
-            data = [self.read_struct() for i in range(self.read_vint())]
+    def compile_struct(self):
+        """
+        Compiles a decoder for structures shaped like the next one, see
+        :func:`compile_struct`. Doesn't move the cursor.
+        """
+        self.byte_align()
+        return compile_struct(self._struct_buffers()[0], self.tell())
 
-        elif datatype == 0x01:  # bitarray, weird alignment requirements
-            bits = self.read_vint()
-            data = self.read_bits(bits)
+    def read_compiled_struct(self, decode):
+        """
+        Reads the next structure with a decoder from :meth:`compile_struct`.
+        Returns None, and doesn't move the cursor, if the structure has
+        another shape.
+        """
+        self.byte_align()
+        struct_data, struct_view = self._struct_buffers()
+        result = decode(struct_data, self.tell(), struct_view)
+        if result is None:
+            return None
+        self._buffer.seek(result[1])
+        return result[0]
+
+    def _struct_buffers(self):
+        # The contents in a buffer that indexes to integers, which takes a
+        # copy on Python 2, and the view lazy blobs are sliced out of.
+        if self._struct_data is None:
+            contents = self._buffer._contents
+            self._struct_data = bytearray(contents) if str is bytes else contents
+            if self._lazy_blobs:
+                self._struct_view = memoryview(self._struct_data)
+        return self._struct_data, self._struct_view
 
-        elif datatype == 0x02:  # blob
-            length = self.read_vint()
-            data = self._buffer.read_bytes(length)
 
-        elif datatype == 0x03:  # choice
-            flag = self.read_vint()
-            data = self.read_struct()
+try:
+    _int_from_bytes = functools.partial(int.from_bytes, byteorder="big")
+except AttributeError:  # Python 2
 
-        elif datatype == 0x04:  # optional
-            exists = self._buffer.read_uint8() != 0
-            data = self.read_struct() if exists else None
+    def _int_from_bytes(data):
+        return int(binascii.hexlify(data), 16) if data else 0
+
+
+def _read_vint(data, index):
+    """
+    Reads the vint starting at byte ``index`` of ``data``. Returns the value
+    and the index of the byte following it.
+    """
+    byte = data[index]
+    negative = byte & 0x01
+    result = (byte & 0x7F) >> 1
+    bits = 6
+    while byte & 0x80:
+        index += 1
+        byte = data[index]
+        result |= (byte & 0x7F) << bits
+        bits += 7
+    return (-result if negative else result), index + 1
+
+
+def _read_struct(data, index, datatype=None, view=None):
+    """
+    Decodes the nested data structure starting at byte ``index`` of ``data``,
+    which must index to integers. Structures are byte aligned so the walk
+    works on plain byte offsets, and it keeps the open arrays and structs on
+    an explicit stack instead of recursing once per node.
+
+    Blobs and u32 values are sliced out of ``view`` when one is given, which
+    makes them zero-copy memoryviews, and copied into byte strings otherwise.
+
+    Returns the value, the index of the following byte and the number of
+    bits used from the last byte if the walk ended part way through it.
+    """
+    length = len(data)
+
+    #: The open containers, as [container, entries left, key] lists. The
+    #: key is None for arrays.
+    stack = list()
+
+    if datatype is None:
+        datatype = data[index]
+        index += 1
+
+    while True:
+        tail_bits = 0
+
+        if datatype == 0x09:  # vint
+            byte = data[index]
+            if byte & 0x80:
+                value, index = _read_vint(data, index)
+            else:
+                value = -(byte >> 1) if byte & 0x01 else byte >> 1
+                index += 1
 
         elif datatype == 0x05:  # Struct
-            entries = self.read_vint()
-            data = dict(
-                [(self.read_vint(), self.read_struct()) for i in range(entries)]
-            )
+            entries, index = _read_vint(data, index)
+            if entries:
+                key, index = _read_vint(data, index)
+                stack.append([dict(), entries, key])
+                datatype = data[index]
+                index += 1
+                continue
+            value = dict()
+
+        elif datatype == 0x00:  # array
+            entries, index = _read_vint(data, index)
+            if entries:
+                stack.append([list(), entries, None])
+                datatype = data[index]
+                index += 1
+                continue
+            value = list()
 
         elif datatype == 0x06:  # u8
-            data = ord(self._buffer.read(1))
+            value = data[index]
+            index += 1
 
-        elif datatype == 0x07:  # u32
-            data = self._buffer.read_bytes(4)  # self.read_uint32()
+        elif datatype == 0x02 or datatype == 0x07:  # blob, u32
+            if datatype == 0x02:
+                count, index = _read_vint(data, index)
+            else:
+                count = 4
+            end = index + count
+            if end > length:
+                raise EOFError("Tried to read {0} bytes past the end".format(count))
+            value = view[index:end] if view is not None else bytes(data[index:end])
+            index = end
+
+        elif datatype == 0x03:  # choice
+            flag, index = _read_vint(data, index)
+            datatype = data[index]
+            index += 1
+            continue
+
+        elif datatype == 0x04:  # optional
+            if data[index] != 0:
+                datatype = data[index + 1]
+                index += 2
+                continue
+            value = None
+            index += 1
 
         elif datatype == 0x08:  # u64
-            data = self._buffer.read_uint64()
+            value = _int_from_bytes(data[index : index + 8])
+            index += 8
 
-        elif datatype == 0x09:  # vint
-            data = self.read_vint()
+        elif datatype == 0x01:  # bitarray, weird alignment requirements
+            bits, index = _read_vint(data, index)
+            if bits < 0:
+                # Game summaries have these. Take the single masked byte
+                # that BitPackedDecoder.read_bits has always returned.
+                value = data[index] & BitPackedDecoder._lo_masks[bits]
+                index += 1
+            else:
+                count = bits >> 3
+                value = _int_from_bytes(data[index : index + count])
+                index += count
+                tail_bits = bits & 7
+            if tail_bits:
+                value = value << tail_bits | data[index] & (0xFF >> (8 - tail_bits))
+                index += 1
 
         else:
             raise TypeError("Unknown Data Structure: '{0}'".format(datatype))
 
+        # Hand the value to its container, closing every container that
+        # it completes along the way.
+        while stack:
+            frame = stack[-1]
+            container, entries, key = frame
+            if key is None:
+                container.append(value)
+            else:
+                container[key] = value
+
+            if entries > 1:
+                frame[1] = entries - 1
+                if key is not None:
+                    byte = data[index]
+                    if byte & 0x80:
+                        frame[2], index = _read_vint(data, index)
+                    else:
+                        frame[2] = -(byte >> 1) if byte & 0x01 else byte >> 1
+                        index += 1
+                break
+
+            stack.pop()
+            value = container
+        else:
+            return value, index, tail_bits
+
+        datatype = data[index]
+        index += 1
+
+
+def _struct_shape(data, index, datatype):
+    """
+    Describes the layout of the structure node at byte ``index``, just past
+    its type byte. Returns the shape and the index of the following byte.
+    Optional values missing from this instance have an unknown (None) shape.
+    """
+    if datatype == 0x05:
+        entries, index = _read_vint(data, index)
+        fields = list()
+        for i in range(entries):
+            key, index = _read_vint(data, index)
+            field_type = data[index]
+            shape, index = _struct_shape(data, index + 1, field_type)
+            fields.append((key, field_type, shape))
+        return ("struct", tuple(fields)), index
+
+    elif datatype == 0x04 and data[index] != 0:
+        inner_type = data[index + 1]
+        shape, index = _struct_shape(data, index + 2, inner_type)
+        return ("optional", inner_type, shape), index
+
+    elif datatype == 0x04:
+        return ("optional", None, None), index + 1
+
+    value, index, tail_bits = _read_struct(data, index, datatype)
+    return datatype, index
+
+
+class _StructSource(object):
+    """Python source for the decoder of one compiled structure shape"""
+
+    def __init__(self):
+        self.lines = list()
+        self.names = 0
+
+    def name(self):
+        self.names += 1
+        return "v{0}".format(self.names)
+
+    def add(self, depth, line):
+        self.lines.append("    " * depth + line)
+
+    def value(self, depth, target, datatype, shape):
+        # The cursor i sits just past the type byte, which has been checked
+        if datatype == 0x09:
+            self.add(depth, "byte = data[i]")
+            self.add(depth, "if byte & 0x80:")
+            self.add(depth + 1, "{0}, i = read_vint(data, i)".format(target))
+            self.add(depth, "else:")
+            self.add(
+                depth + 1,
+                "{0} = -(byte >> 1) if byte & 0x01 else byte >> 1".format(target),
+            )
+            self.add(depth + 1, "i += 1")
+
+        elif datatype == 0x06:
+            self.add(depth, "{0} = data[i]".format(target))
+            self.add(depth, "i += 1")
+
+        elif datatype == 0x02 or datatype == 0x07:
+            if datatype == 0x02:
+                self.add(depth, "count, i = read_vint(data, i)")
+                self.add(depth, "end = i + count")
+            else:
+                self.add(depth, "end = i + 4")
+            self.add(depth, "if end > length:")
+            self.add(depth + 1, "return None")
+            self.add(
+                depth,
+                "{0} = view[i:end] if view is not None else bytes(data[i:end])".format(
+                    target
+                ),
+            )
+            self.add(depth, "i = end")
+
+        elif datatype == 0x05:
+            self.struct(depth, target, shape[1], as_list=False)
+
+        elif datatype == 0x04 and shape[1] is not None:
+            self.add(depth, "if data[i] != 0:")
+            self.add(depth + 1, "if data[i + 1] != {0}:".format(shape[1]))
+            self.add(depth + 2, "return None")
+            self.add(depth + 1, "i += 2")
+            self.value(depth + 1, target, shape[1], shape[2])
+            self.add(depth, "else:")
+            self.add(depth + 1, "{0} = None".format(target))
+            self.add(depth + 1, "i += 1")
+
+        else:
+            # Everything else goes through the generic walker. A walk that
+            # ends part way through a byte can't be resumed from a byte index.
+            self.add(
+                depth,
+                "{0}, i, tail_bits = read_struct(data, i, {1}, view)".format(
+                    target, datatype
+                ),
+            )
+            self.add(depth, "if tail_bits:")
+            self.add(depth + 1, "return None")
+
+    def struct(self, depth, target, fields, as_list):
+        self.add(depth, "if data[i] != {0}:".format(len(fields) << 1))
+        self.add(depth + 1, "return None")
+        self.add(depth, "i += 1")
+        names = list()
+        for key, datatype, shape in fields:
+            names.append(self.name())
+            self.add(
+                depth,
+                "if data[i] != {0} or data[i + 1] != {1}:".format(key << 1, datatype),
+            )
+            self.add(depth + 1, "return None")
+            self.add(depth, "i += 2")
+            self.value(depth, names[-1], datatype, shape)
+
+        if as_list:
+            self.add(depth, "{0} = [{1}]".format(target, ", ".join(names)))
+        else:
+            items = ["{0}: {1}".format(f[0], n) for f, n in zip(fields, names)]
+            self.add(depth, "{0} = {{{1}}}".format(target, ", ".join(items)))
+
+
+#: Compiled structure decoders shared by every replay, keyed by shape
+_compiled_structs = dict()
+
+
+def compile_struct(data, index):
+    """
+    Compiles a decoder for structures laid out like the one starting at byte
+    ``index`` of ``data``, which must index to integers. Returns None if the
+    structure can't be compiled.
+
+    The decoder is called as ``decode(data, index, view)`` and returns the
+    same value as :meth:`BitPackedDecoder.read_struct` together with the
+    index of the following byte, except that the fields of the outer struct
+    come back in a list when its keys are 0 to n-1. It returns None without
+    reading anything further when the structure at ``index`` has a
+    different shape.
+    """
+    if data[index] != 0x05:
+        return None
+
+    shape, end = _struct_shape(data, index + 1, 0x05)
+    if shape not in _compiled_structs:
+        _compiled_structs[shape] = _compile_shape(shape)
+    return _compiled_structs[shape]
+
+
+def _compile_shape(shape):
+    # Counts and keys are matched against single bytes
+    def compilable(shape):
+        if not isinstance(shape, tuple):
+            return True
+        elif shape[0] == "optional":
+            return compilable(shape[2])
+        return len(shape[1]) < 64 and all(
+            0 <= key < 64 and compilable(field) for key, datatype, field in shape[1]
+        )
+
+    if not compilable(shape):
+        return None
+
+    fields = shape[1]
+    as_list = [field[0] for field in fields] == list(range(len(fields)))
+    source = _StructSource()
+    source.add(0, "def decode(data, i, view):")
+    source.add(1, "length = len(data)")
+    source.add(1, "if data[i] != 5:")
+    source.add(2, "return None")
+    source.add(1, "i += 1")
+    source.struct(1, "value", fields, as_list)
+    source.add(1, "return value, i")
+
+    namespace = dict(
+        read_vint=_read_vint,
+        read_struct=_read_struct,
+        bytes=bytes,
+    )
+    exec(compile("\n".join(source.lines), "<compiled struct>", "exec"), namespace)
+    return namespace["decode"]
+
+
+class FastBitPackedDecoder(object):
+    """
+    :param contents: The string of file-like object to decode
+    :param lazy_blobs: Return blobs from :meth:`read_struct` as memoryview
+        slices of the contents instead of byte strings.
+
+    A drop-in replacement for :class:`BitPackedDecoder` which tracks its
+    position as a single integer bit offset into the contents instead of
+    routing every read through a :class:`ByteDecoder`. Values are pulled
+    straight out of the buffer with integer shifts and masks.
+
+    Reads are bit for bit identical to :class:`BitPackedDecoder`. Enable it
+    for replays with the ``fast_decoder=True`` load option.
+    """
+
+    #: Maps bit counts to low bit masks. Kept for compatibility with
+    #: readers that inspect :class:`BitPackedDecoder` masks directly.
+    _lo_masks = BitPackedDecoder._lo_masks
+
+    def __init__(self, contents, lazy_blobs=False):
+        if hasattr(contents, "read"):
+            contents = contents.read()
+
+        # Byte strings index to characters on Python 2, bytearrays and
+        # memoryviews of unsigned bytes index to integers everywhere.
+        if isinstance(contents, memoryview) and str is not bytes:
+            contents = contents.cast("B")
+        elif str is bytes:
+            contents = bytearray(contents)
+
+        #: The buffer being decoded
+        self._data = contents
+
+        #: The current position in the buffer, in bits
+        self._pos = 0
+
+        self.length = len(contents)
+
+        #: Source of the zero-copy blob slices when ``lazy_blobs`` is set
+        self._view = memoryview(contents) if lazy_blobs else None
+
+    @property
+    def _bit_shift(self):
+        return self._pos & 7
+
+    def tell(self):
+        """
+        Returns the index of the next byte that hasn't been fully used
+        """
+        return (self._pos + 7) >> 3
+
+    def done(self):
+        """
+        Returns true when all bytes in the buffer have been used
+        """
+        return (self._pos + 7) >> 3 == self.length
+
+    def peek(self, count):
+        """
+        Returns the raw byte string for the next ``count`` bytes
+        """
+        start = (self._pos + 7) >> 3
+        return bytes(self._data[start : start + count])
+
+    def read_range(self, start, end):
+        """
+        Returns the raw byte string from the indicated address range
+        """
+        return bytes(self._data[start:end])
+
+    def byte_align(self):
+        """
+        Moves cursor to the beginning of the next byte
+        """
+        self._pos = (self._pos + 7) & ~7
+
+    def read_bool(self):
+        """
+        Returns the next bit as an integer
+        """
+        pos = self._pos
+        self._pos = pos + 1
+        return (self._data[pos >> 3] >> (pos & 7)) & 1
+
+    def read_uint8(self):
+        """
+        Returns the next 8 bits as an unsigned integer
+        """
+        pos = self._pos
+        index = pos >> 3
+        shift = pos & 7
+        self._pos = pos + 8
+        if shift:
+            data = self._data
+            return (data[index] >> shift) << shift | data[index + 1] & (
+                0xFF >> (8 - shift)
+            )
+        return self._data[index]
+
+    def read_uint16(self):
+        """
+        Returns the next 16 bits as an unsigned integer
+        """
+        return self.read_bits(16)
+
+    def read_uint32(self):
+        """
+        Returns the next 32 bits as an unsigned integer
+        """
+        return self.read_bits(32)
+
+    def read_uint64(self):
+        """
+        Returns the next 64 bits as an unsigned integer
+        """
+        return self.read_bits(64)
+
+    def read_vint(self):
+        """
+        Reads a signed integer of variable length
+        """
+        data = self._data
+        index = (self._pos + 7) >> 3
+        byte = data[index]
+        negative = byte & 0x01
+        result = (byte & 0x7F) >> 1
+        bits = 6
+        while byte & 0x80:
+            index += 1
+            byte = data[index]
+            result |= (byte & 0x7F) << bits
+            bits += 7
+        self._pos = (index + 1) << 3
+        return -result if negative else result
+
+    def read_aligned_bytes(self, count):
+        """
+        Skips to the beginning of the next byte and returns the next ``count`` bytes as a byte string
+        """
+        start = (self._pos + 7) >> 3
+        end = start + count
+        if end > self.length:
+            raise EOFError("Tried to read {0} bytes past the end".format(count))
+        self._pos = end << 3
+        return bytes(self._data[start:end])
+
+    def read_aligned_string(self, count, encoding="utf8"):
+        """
+        Skips to the beginning of the next byte and returns the next ``count`` bytes decoded with encoding (default utf8)
+        """
+        return self.read_aligned_bytes(count).decode(encoding)
+
+    def read_bytes(self, count):
+        """
+        Returns the next ``count*8`` bits as a byte string
+        """
+        if self._pos & 7 == 0:
+            return self.read_aligned_bytes(count)
+        return bytes(bytearray(self.read_uint8() for i in range(count)))
+
+    def read_bits(self, count):
+        """Returns
+        the next ``count`` bits as an unsigned integer
+        """
+        pos = self._pos
+        data = self._data
+        index = pos >> 3
+        shift = pos & 7
+        self._pos = pos + count
+
+        # If we've got a byte in progress use it first
+        if shift:
+            bits_left = 8 - shift
+            if count <= bits_left:
+                return (data[index] >> shift) & (0xFF >> (8 - count))
+            count -= bits_left
+            result = data[index] >> shift
+            index += 1
+        else:
+            result = 0
+
+        # Then grab any additional whole bytes as needed
+        size = count >> 3
+        if size == 1:
+            result = result << 8 | data[index]
+            index += 1
+        elif size:
+            chunk = data[index : index + size]
+            if len(chunk) != size:
+                raise EOFError("Tried to read {0} bits past the end".format(count))
+            result = result << (size << 3) | _int_from_bytes(chunk)
+            index += size
+
+        # Grab any trailing bits from the next byte
+        count &= 7
+        if count:
+            result = result << count | data[index] & (0xFF >> (8 - count))
+
+        return result
+
+    def read_frames(self):
+        """
+        Reads a frame count as an unsigned integer
+        """
+        byte = self.read_uint8()
+        additional_bytes = byte & 0x03
+        if additional_bytes == 0:
+            return byte >> 2
+        return (byte >> 2) << (additional_bytes << 3) | self.read_bits(
+            additional_bytes << 3
+        )
+
+    def read_struct(self, datatype=None):
+        """
+        Reads a nested data structure. If the type is not specified
+        the first byte is used as the type identifier.
+        """
+        data, index, tail_bits = _read_struct(
+            self._data, (self._pos + 7) >> 3, datatype, self._view
+        )
+        self._pos = index << 3 if tail_bits == 0 else (index - 1) << 3 | tail_bits
         return data
+
+    def compile_struct(self):
+        """
+        Compiles a decoder for structures shaped like the next one, see
+        :func:`compile_struct`. Doesn't move the cursor.
+        """
+        return compile_struct(self._data, (self._pos + 7) >> 3)
+
+    def read_compiled_struct(self, decode):
+        """
+        Reads the next structure with a decoder from :meth:`compile_struct`.
+        Returns None, and doesn't move the cursor, if the structure has
+        another shape.
+        """
+        result = decode(self._data, (self._pos + 7) >> 3, self._view)
+        if result is None:
+            return None
+        self._pos = result[1] << 3
+        return result[0]
@@ -2,8 +2,32 @@
 from __future__ import absolute_import, print_function, unicode_literals, division
 
 import collections
+import copy
+import itertools
+import multiprocessing
+import time
+import traceback
+
+import sc2reader
 from sc2reader.events import *
+from sc2reader.exceptions import LoadError, ReplayRejectedError
 from sc2reader.engine.events import InitGameEvent, EndGameEvent, PluginExit
+from sc2reader.engine.utils import EngineCheckpoints, PluginProfile
+
+try:
+    unicode
+except NameError:
+    basestring = unicode = str
+
+try:
+    timer = time.perf_counter
+except AttributeError:  # Python 2
+    timer = time.time
+
+
+def _frame(event):
+    # InitGame comes before all the frames
+    return getattr(event, "frame", -1)
 
 
 class GameEngine(object):
@@ -86,7 +110,7 @@ class GameEngine(object):
     If a plugin wishes to stop processing a replay it can yield a PluginExit event before returning::
 
         def handleEvent(self, event, replay):
-            if len(replay.tracker_events) == 0:
+            if not replay.has_tracker_events:
                 yield PluginExit(self, code=0, details=dict(msg="tracker events required"))
                 return
             ...
@@ -112,14 +136,101 @@ class GameEngine(object):
             code, details = replay.plugins['RequiredPlugin']
             message = "RequiredPlugin failed with code: {0}. Cannot continue.".format(code)
             yield PluginExit(self, code=1, details=dict(msg=message))
+
+    Profiling
+    -------------------------
+
+    An engine created with ``profile=True`` times every handler call and
+    stores a :class:`~sc2reader.engine.utils.PluginProfile` on the replay.
+    It holds the call count, total and longest wall time, and yielded event
+    count of each handler. The profiles of a batch of replays can be added up::
+
+        engine = GameEngine(plugins=[ContextLoader(), APMTracker()], profile=True)
+        total = PluginProfile()
+        for replay in sc2reader.load_replays(paths, engine=engine):
+            total.merge(replay.plugin_profile)
+        print(total.plugin_totals())
+
+    Streaming
+    -------------------------
+
+    By default the engine runs over ``replay.events`` once the replay is
+    fully loaded. ``run`` also takes any frame ordered iterable of events,
+    such as :meth:`~sc2reader.resources.Replay.iter_events`, and pulls from
+    it one event at a time, so plugins can start before the events are all
+    decoded. Once every plugin has exited the rest of the events aren't
+    pulled at all. Replays are run this way with the ``stream_events``
+    load option::
+
+        replay = sc2reader.load_replay(path, engine=engine, stream_events=True)
+
+    Seeking
+    -------------------------
+
+    An engine created with ``checkpoint_frames`` takes a checkpoint of the
+    replay and plugin state every so many frames of a run and stores them
+    on ``replay.engine_checkpoints``. :meth:`seek` then gets the state at
+    any frame by restoring the checkpoint before it and running only the
+    events after the checkpoint. The checkpoints can be saved to a file and
+    used to seek the same replay, loaded with the same plugins, elsewhere::
+
+        plugins = [ContextLoader(), SelectionTracker()]
+        engine = GameEngine(plugins=plugins, checkpoint_frames=1344)
+        replay = sc2reader.load_replay(path, engine=engine)
+        replay.engine_checkpoints.save(path + ".checkpoints")
+        ...
+        replay = sc2reader.load_replay(path, engine=None)
+        checkpoints = EngineCheckpoints.load(path + ".checkpoints")
+        engine.seek(replay, 20 * 60 * 22, checkpoints)
+        print(replay.player[1].selection[10])
+
+    Batches
+    -------------------------
+
+    :meth:`run_many` runs a batch of replays, optionally spread over worker
+    processes, for plugins that add up results across replays. Plugins can
+    opt in with these methods:
+
+      * handleBatchStart(self) - is called before the first replay of a
+        batch to set up the batch accumulators.
+
+      * mergeBatch(self, other) - adds the accumulators of ``other``, a copy
+        of the plugin that ran part of the batch in a worker, to this one.
+
+      * handleBatchEnd(self) - is called once all the replays have been run
+        and merged, to finish off the batch results.
+
+    Workers run the batch in chunks, each with fresh copies of the plugins,
+    and send back only the copies with a ``mergeBatch`` method, so the
+    replays never leave the workers::
+
+        apm = APMTracker()
+        engine = GameEngine(plugins=[ContextLoader(), apm])
+        engine.run_many("path/to/replays", workers=4, load_level=4)
+        print(sorted(apm.batch_avg_apm))
     """
 
-    def __init__(self, plugins=[]):
+    def __init__(self, plugins=[], profile=False, checkpoint_frames=None):
         self._plugins = list()
+
+        #: Time the event handlers and store a
+        #: :class:`~sc2reader.engine.utils.PluginProfile` of each run on
+        #: ``replay.plugin_profile``
+        self.profile = profile
+
+        #: Take a checkpoint of the replay state for :meth:`seek` this many
+        #: frames apart and store them on ``replay.engine_checkpoints``
+        self.checkpoint_frames = checkpoint_frames
+
+        # Event handler tables for each set of active plugins, kept between
+        # runs. See _get_handler_table.
+        self._handler_tables = dict()
+
         self.register_plugins(*plugins)
 
     def register_plugin(self, plugin):
         self._plugins.append(plugin)
+        self._handler_tables.clear()
 
     def register_plugins(self, *plugins):
         for plugin in plugins:
@@ -128,14 +239,12 @@ class GameEngine(object):
     def plugins(self):
         return self._plugins
 
-    def run(self, replay):
-        # A map of [event.name] => event handlers in plugin registration order
-        # ranked from most generic to most specific
-        handlers = dict()
-
-        # Create a local copy of the plugins list. As plugins exit we can
-        # remove them from this list and regenerate event handlers.
-        plugins = list(self._plugins)
+    def run(self, replay, events=None):
+        # A map of event class => event handlers in plugin registration order
+        # ranked from most generic to most specific. The map is shared by all
+        # runs with the same plugins and filled in as event classes come up.
+        plugins = tuple(self._plugins)
+        handlers = self._get_handler_table(plugins)
 
         # Create a dict for storing plugin exit codes and details.
         replay.plugin_result = replay.plugins = dict()
@@ -143,31 +252,181 @@ class GameEngine(object):
         # Create a list storing replay.plugins keys for failures.
         replay.plugin_failures = list()
 
-        # Fill event event queue with the replay events, bookmarked by Init and End events.
-        event_queue = collections.deque()
-        event_queue.append(InitGameEvent())
-        event_queue.extend(replay.events)
-        event_queue.append(EndGameEvent())
+        # Handler timings, only when asked for
+        profile = PluginProfile() if self.profile else None
+        if profile is not None:
+            replay.plugin_profile = profile
+
+        # Iterate over the replay events, bookmarked by Init and End events,
+        # without copying them into the event queue. The events are only
+        # pulled as they are needed so they can still be being decoded.
+        if events is None:
+            events = replay.events
+        replay_events = itertools.chain([InitGameEvent()], events, [EndGameEvent()])
+
+        # Take checkpoints for seek, which can only be made on replay.events
+        checkpoints = None
+        if self.checkpoint_frames and events is replay.events:
+            checkpoints = replay.engine_checkpoints = EngineCheckpoints(
+                self.checkpoint_frames,
+                [plugin.name for plugin in self._plugins],
+                getattr(replay, "filehash", None),
+            )
+
+        plugins = self._run_events(
+            replay, replay_events, plugins, handlers, profile, checkpoints
+        )
+
+        # For any plugins that didn't yield a PluginExit event or throw unexpected exceptions,
+        # record a successful completion.
+        for plugin in plugins:
+            replay.plugin_result[plugin.name] = (0, dict())
+
+    def run_many(self, replays, workers=None, chunksize=16, factory=None, **options):
+        """
+        Runs a batch of replays through the engine and returns the
+        ``plugin_result`` of each, in order. The replays can be loaded
+        :class:`~sc2reader.resources.Replay` objects, which are run again,
+        or sources that are loaded with this engine and the load options.
+        Replays dropped by a ``where`` test are returned as their
+        :class:`~sc2reader.exceptions.ReplayRejectedError`.
+
+        :param workers: Load and run the sources in a pool of this many
+            processes. Replays stay in the worker, only the plugin results
+            and plugin batch state are sent back. A replay that fails is
+            returned as a :class:`~sc2reader.exceptions.LoadError`.
+        :param chunksize: The number of sources run by each worker batch.
+        :param factory: The :class:`~sc2reader.factories.SC2Factory` to
+            load the sources with, the default sc2reader factory otherwise.
+        """
+        for plugin in self._plugins:
+            if hasattr(plugin, "handleBatchStart"):
+                plugin.handleBatchStart()
+
+        # Paths to a folder are expanded here so workers get single files
+        if isinstance(replays, basestring):
+            options.setdefault("extension", "SC2Replay")
+            replays = sc2reader.utils.get_files(replays, **options)
+
+        try:
+            if not workers:
+                return _run_batch(self, replays, factory, options)
+            return self._run_pool(replays, workers, chunksize, factory, options)
+        finally:
+            # The batch ends even when a replay fails to load
+            for plugin in self._plugins:
+                if hasattr(plugin, "handleBatchEnd"):
+                    plugin.handleBatchEnd()
+
+    def _run_pool(self, replays, workers, chunksize, factory, options):
+        replays = list(replays)
+        chunks = [replays[i : i + chunksize] for i in range(0, len(replays), chunksize)]
+        pool = multiprocessing.Pool(
+            workers,
+            initializer=_init_batch_worker,
+            initargs=(self, factory, options),
+        )
+        try:
+            results = list()
+            for chunk_results, chunk_plugins in pool.imap(_run_in_worker, chunks):
+                results.extend(chunk_results)
+                for plugin, other in zip(self._plugins, chunk_plugins):
+                    if other is not None:
+                        plugin.mergeBatch(other)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+        return results
+
+    def seek(self, replay, frame, checkpoints=None):
+        """
+        Puts the replay state back to how it was when every event up to and
+        including ``frame`` had been handled. The state is restored from the
+        last checkpoint before the frame, from ``replay.engine_checkpoints``
+        unless other checkpoints are given, and only the events after the
+        checkpoint are run again. Without checkpoints the events are run from
+        the start. EndGame isn't run.
+
+        Restoring a checkpoint creates new players, units and other objects
+        the plugins keep on the replay. Events before the checkpoint aren't
+        run again, so the objects the plugins attached to them, such as
+        ``event.player`` or ``event.unit``, are still the ones from the
+        earlier run, in the state that run left them in. Look them up again
+        on the replay, in ``replay.objects`` or ``replay.player``, by id
+        rather than going through those events. Events after the checkpoint
+        are run again and point at the restored objects.
+        """
+        if checkpoints is None:
+            checkpoints = getattr(replay, "engine_checkpoints", None)
+        checkpoint = checkpoints.find(frame) if checkpoints else None
+
+        if checkpoint is None:
+            plugins = tuple(self._plugins)
+            replay.plugin_result = replay.plugins = dict()
+            replay.plugin_failures = list()
+            events = itertools.chain([InitGameEvent()], replay.events)
+        else:
+            if checkpoints.plugin_names != tuple(p.name for p in self._plugins):
+                raise ValueError(
+                    "The checkpoints were taken with plugins {0}".format(
+                        ", ".join(checkpoints.plugin_names)
+                    )
+                )
+            if checkpoints.filehash != getattr(replay, "filehash", None):
+                raise ValueError("The checkpoints were taken on another replay")
+            plugins = tuple(checkpoints.restore(checkpoint, replay, self._plugins))
+            events = itertools.islice(replay.events, checkpoint.position, None)
+
+        events = itertools.takewhile(lambda event: _frame(event) <= frame, events)
+        self._run_events(
+            replay, events, plugins, self._get_handler_table(plugins), None, None
+        )
 
+    def _run_events(
+        self, replay, replay_events, plugins, handlers, profile, checkpoints
+    ):
         # Work through the events in the queue, pushing newly emitted events to
-        # the front of the line for immediate processing.
-        while len(event_queue) > 0:
-            event = event_queue.popleft()
-
-            if event.name == "PluginExit":
-                # Remove the plugin and reset the handlers.
-                plugins.remove(event.plugin)
-                handlers.clear()
-                replay.plugin_result[event.plugin.name] = (event.code, event.details)
-                if event.code != 0:
-                    replay.plugin_failures.append(event.plugin.name)
+        # the front of the line for immediate processing. The next replay event
+        # is taken once the queue runs empty.
+        event_queue = collections.deque()
+        while True:
+            if event_queue:
+                event = event_queue.popleft()
+
+                # Only plugins emit PluginExit, so replay events skip the check
+                if event.name == "PluginExit":
+                    # Remove the plugin and switch to the handlers without it.
+                    plugins, handlers = self._remove_plugin(
+                        plugins, handlers, event.plugin
+                    )
+                    replay.plugin_result[event.plugin.name] = (
+                        event.code,
+                        event.details,
+                    )
+                    if event.code != 0:
+                        replay.plugin_failures.append(event.plugin.name)
+
+                    # Nothing is left to handle the rest of the events, so
+                    # don't pull (and decode) any more of them.
+                    if not plugins:
+                        break
+            else:
+                event = next(replay_events, None)
+                if event is None:
+                    break
+                if checkpoints is not None:
+                    checkpoints.update(replay, self._plugins, plugins, event)
 
             # If we haven't compiled a list of handlers for this event yet, do so!
-            if event.name not in handlers:
+            event_handlers = handlers.get(event.__class__)
+            if event_handlers is None:
                 event_handlers = self._get_event_handlers(event, plugins)
-                handlers[event.name] = event_handlers
-            else:
-                event_handlers = handlers[event.name]
+                handlers[event.__class__] = event_handlers
+
+            # Most events have no handlers at all, move straight on to the next
+            if not event_handlers:
+                continue
 
             # Events have the option of yielding one or more additional events
             # which get processed after the current event finishes. The new_events
@@ -175,6 +434,8 @@ class GameEngine(object):
             # the order again with a series of appendlefts.
             new_events = collections.deque()
             for event_handler in event_handlers:
+                if profile is not None:
+                    start, queued = timer(), len(new_events)
                 try:
                     for new_event in event_handler(event, replay) or []:
                         if new_event.name == "PluginExit":
@@ -191,17 +452,46 @@ class GameEngine(object):
                             event_handler.__self__, code=1, details=dict(error=e)
                         )
                         new_events.append(new_event)
+                if profile is not None:
+                    profile.record(
+                        event_handler, timer() - start, len(new_events) - queued
+                    )
             event_queue.extendleft(new_events)
 
-        # For any plugins that didn't yield a PluginExit event or throw unexpected exceptions,
-        # record a successful completion.
-        for plugin in plugins:
-            replay.plugin_result[plugin.name] = (0, dict())
+        return plugins
+
+    def _get_handler_table(self, plugins):
+        # Tables are keyed by plugin identity and hold on to the plugins so
+        # that their ids can't be reused while the table is cached.
+        key = tuple(id(plugin) for plugin in plugins)
+        if key not in self._handler_tables:
+            self._handler_tables[key] = (plugins, dict())
+        return self._handler_tables[key][1]
+
+    def _remove_plugin(self, plugins, handlers, plugin):
+        index = plugins.index(plugin)
+        remaining = plugins[:index] + plugins[index + 1 :]
+        key = tuple(id(plugin) for plugin in remaining)
+        if key not in self._handler_tables:
+            table = dict()
+            if not any(other is plugin for other in remaining):
+                # Derive the table from the current one rather than starting
+                # again from nothing.
+                for event_class, event_handlers in handlers.items():
+                    table[event_class] = [
+                        handler
+                        for handler in event_handlers
+                        if handler.__self__ is not plugin
+                    ]
+            self._handler_tables[key] = (remaining, table)
+        return remaining, self._handler_tables[key][1]
 
     def _get_event_handlers(self, event, plugins):
-        return sum(
-            [self._get_plugin_event_handlers(plugin, event) for plugin in plugins], []
-        )
+        return [
+            handler
+            for plugin in plugins
+            for handler in self._get_plugin_event_handlers(plugin, event)
+        ]
 
     def _get_plugin_event_handlers(self, plugin, event):
         handlers = list()
@@ -222,3 +512,55 @@ class GameEngine(object):
         if hasattr(plugin, "handle" + event.name):
             handlers.append(getattr(plugin, "handle" + event.name, None))
         return handlers
+
+
+def _run_batch(engine, replays, factory, options):
+    load_replay = factory.load_replay if factory else sc2reader.load_replay
+    results = list()
+    for replay in replays:
+        if hasattr(replay, "events"):
+            engine.run(replay)
+        else:
+            try:
+                replay = load_replay(replay, engine=engine, **options)
+            except ReplayRejectedError as e:
+                results.append(e)
+                continue
+        results.append(replay.plugin_result)
+    return results
+
+
+#: The engine, factory and load options of a run_many worker
+_worker_state = None
+
+
+def _init_batch_worker(engine, factory, options):
+    global _worker_state
+    _worker_state = (engine, factory, options)
+
+
+def _run_in_worker(sources):
+    # Each chunk is run by fresh copies of the plugins, so the batch state
+    # sent back holds just this chunk and can be merged as it is.
+    engine, factory, options = _worker_state
+    plugins = copy.deepcopy(engine.plugins())
+    chunk_engine = GameEngine(
+        plugins=plugins,
+        profile=engine.profile,
+        checkpoint_frames=engine.checkpoint_frames,
+    )
+    for plugin in plugins:
+        if hasattr(plugin, "handleBatchStart"):
+            plugin.handleBatchStart()
+
+    results = list()
+    for source in sources:
+        try:
+            results.extend(_run_batch(chunk_engine, [source], factory, options))
+        except Exception as e:
+            results.append(
+                LoadError(source, e.__class__.__name__, str(e), traceback.format_exc())
+            )
+    return results, [
+        plugin if hasattr(plugin, "mergeBatch") else None for plugin in plugins
+    ]
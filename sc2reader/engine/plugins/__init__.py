@@ -7,3 +7,4 @@ from sc2reader.engine.plugins.context import ContextLoader
 from sc2reader.engine.plugins.supply import SupplyTracker
 from sc2reader.engine.plugins.creeptracker import CreepTracker
 from sc2reader.engine.plugins.gameheart import GameHeartNormalizer
+from sc2reader.engine.plugins.lifecycle import UnitLifecycleTracker
@@ -14,10 +14,31 @@ class APMTracker(object):
     necessarily the whole game) multiplied by 60.
 
     APM is 0 for games under 1 minute in length.
+
+    In a :meth:`~sc2reader.engine.engine.GameEngine.run_many` batch the
+    ``avg_apm`` of every human is also collected in ``batch_avg_apm``. It
+    holds the last batch until the next one starts, replays run outside a
+    batch aren't added to it.
     """
 
     name = "APMTracker"
 
+    #: The avg_apm of every human in the current or last batch
+    batch_avg_apm = None
+
+    #: True while a batch is running
+    in_batch = False
+
+    def handleBatchStart(self):
+        self.batch_avg_apm = list()
+        self.in_batch = True
+
+    def mergeBatch(self, other):
+        self.batch_avg_apm.extend(other.batch_avg_apm)
+
+    def handleBatchEnd(self):
+        self.in_batch = False
+
     def handleInitGame(self, event, replay):
         for human in replay.humans:
             human.apm = defaultdict(int)
@@ -47,3 +68,5 @@ class APMTracker(object):
                 )
             else:
                 human.avg_apm = 0
+            if self.in_batch:
+                self.batch_avg_apm.append(human.avg_apm)
@@ -70,7 +70,7 @@ class ContextLoader(object):
 
         if event.target_unit_id in replay.objects:
             event.target = replay.objects[event.target_unit_id]
-            if not replay.tracker_events and not event.target.is_type(
+            if not replay.has_tracker_events and not event.target.is_type(
                 event.target_unit_type
             ):
                 replay.datapack.change_type(
@@ -114,7 +114,7 @@ class ContextLoader(object):
             # If we don't have access to tracker events, use selection events to create
             # new units and track unit type changes. It won't be perfect, but it is better
             # than nothing.
-            if not replay.tracker_events:
+            if not replay.has_tracker_events:
                 # Starting at 23925 the default viking mode is assault. Most people expect
                 # the default viking mode to be figher so fudge it a bit here.
                 if (
@@ -32,7 +32,7 @@ class CreepTracker(object):
 
     def handleInitGame(self, event, replay):
         try:
-            if len(replay.tracker_events) == 0:
+            if not replay.has_tracker_events:
                 return
             if replay.map is None:
                 replay.load_map()
@@ -81,7 +81,7 @@ class CreepTracker(object):
 
     def handleEndGame(self, event, replay):
         try:
-            if len(replay.tracker_events) == 0:
+            if not replay.has_tracker_events:
                 return
             for player in replay.players:
                 if player.play_race[0] == "Z":
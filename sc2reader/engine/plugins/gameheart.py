@@ -30,13 +30,13 @@ class GameHeartNormalizer(object):
 
     def handleInitGame(self, event, replay):
         # without tracker events game heart games can't be fixed
-        if len(replay.tracker_events) == 0:
+        if not replay.has_tracker_events:
             yield PluginExit(self, code=0, details=dict())
             return
 
         start_frame = -1
         actual_players = {}
-        for event in replay.tracker_events:
+        for event in replay.iter_tracker_events():
             if start_frame != -1 and event.frame > start_frame + 5:  # fuzz it a little
                 break
             if (
@@ -55,27 +55,45 @@ class GameHeartNormalizer(object):
                     ]
 
         self.fix_entities(replay, actual_players)
-        self.fix_events(replay, start_frame)
+
+        # Streamed events are set back by handleEvent as the engine reaches
+        # them, including the message events that are already loaded
+        streamed = "replay.tracker.events" not in replay.raw_data
+        if not streamed:
+            self.fix_events(replay, start_frame)
+        self.start_frame = start_frame
 
         replay.frames -= start_frame
         replay.game_length = Length(seconds=replay.frames / 16)
         replay.real_type = get_real_type(replay.teams)
         replay.real_length = Length(
-            seconds=int(replay.game_length.seconds / GAME_SPEED_FACTOR[replay.speed])
+            seconds=int(
+                replay.game_length.seconds
+                / GAME_SPEED_FACTOR[replay.expansion][replay.speed]
+            )
         )
         replay.start_time = datetime.utcfromtimestamp(
             replay.unix_timestamp - replay.real_length.seconds
         )
 
+        if not streamed:
+            yield PluginExit(self, code=0, details=dict())
+
+    def handleEvent(self, event, replay):
+        self.fix_event(event, self.start_frame)
+
     def fix_events(self, replay, start_frame):
         # Set back the game clock for all events
         for event in replay.events:
-            if event.frame < start_frame:
-                event.frame = 0
-                event.second = 0
-            else:
-                event.frame -= start_frame
-                event.second = event.frame >> 4
+            self.fix_event(event, start_frame)
+
+    def fix_event(self, event, start_frame):
+        if event.frame < start_frame:
+            event.frame = 0
+            event.second = 0
+        else:
+            event.frame -= start_frame
+            event.second = event.frame >> 4
 
     def fix_entities(self, replay, actual_players):
         # Change the players that aren't playing into observers
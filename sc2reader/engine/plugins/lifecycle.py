@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, unicode_literals, division
+
+import array
+
+
+class UnitTable(object):
+    """
+    The lifecycle of every unit in a replay kept in columns, one row per
+    unit in the order the units first show up in the tracker events. It is
+    filled straight from the tracker event fields, so it doesn't need
+    :class:`ContextLoader` or a datapack::
+
+        table = UnitTable()
+        table.add_events(replay.iter_tracker_events())
+
+    Frames, pids and unit ids that aren't known are ``-1``. Units entering
+    the game finished have a ``born_frame`` and those that are built or
+    warped in have an ``init_frame`` instead. ``born_x`` and ``born_y`` are
+    where the unit was born or initiated. ``type`` and ``owner`` are the
+    unit's last type and upkeep pid; ``type`` is an index into
+    :attr:`unit_types`.
+
+    Columns are :class:`array.array` until :meth:`to_numpy` is called.
+    """
+
+    #: The names of the columns, in order
+    names = (
+        "unit_id",
+        "type",
+        "owner",
+        "born_frame",
+        "init_frame",
+        "done_frame",
+        "died_frame",
+        "born_x",
+        "born_y",
+        "died_x",
+        "died_y",
+        "killer_pid",
+        "killing_unit_id",
+    )
+
+    def __init__(self):
+        #: A dict of ``{name: column}``
+        self.columns = dict((name, array.array("l")) for name in self.names)
+
+        #: The unit type names indexed by the ``type`` column
+        self.unit_types = list()
+
+        #: The row of each unit id
+        self.rows = dict()
+
+        self._type_index = dict()
+        self._handlers = {
+            "UnitBornEvent": self.add_unit_born,
+            "UnitInitEvent": self.add_unit_init,
+            "UnitDoneEvent": self.add_unit_done,
+            "UnitDiedEvent": self.add_unit_died,
+            "UnitTypeChangeEvent": self.add_unit_type_change,
+            "UnitOwnerChangeEvent": self.add_unit_owner_change,
+        }
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add_events(self, events):
+        """
+        Adds the unit events among the events, in order. Other events are
+        passed over.
+        """
+        handlers = self._handlers
+        for event in events:
+            handler = handlers.get(event.name)
+            if handler is not None:
+                handler(event)
+
+    def add_unit_born(self, event):
+        row = self._row(event.unit_id)
+        self._set_type(row, event.unit_type_name)
+        columns = self.columns
+        columns["owner"][row] = event.upkeep_pid
+        columns["born_frame"][row] = event.frame
+        columns["done_frame"][row] = event.frame
+        columns["born_x"][row] = event.x
+        columns["born_y"][row] = event.y
+
+    def add_unit_init(self, event):
+        row = self._row(event.unit_id)
+        self._set_type(row, event.unit_type_name)
+        columns = self.columns
+        columns["owner"][row] = event.upkeep_pid
+        columns["init_frame"][row] = event.frame
+        columns["born_x"][row] = event.x
+        columns["born_y"][row] = event.y
+
+    def add_unit_done(self, event):
+        self.columns["done_frame"][self._row(event.unit_id)] = event.frame
+
+    def add_unit_died(self, event):
+        row = self._row(event.unit_id)
+        columns = self.columns
+        columns["died_frame"][row] = event.frame
+        columns["died_x"][row] = event.x
+        columns["died_y"][row] = event.y
+        if event.killing_player_id is not None:
+            columns["killer_pid"][row] = event.killing_player_id
+        if event.killing_unit_id is not None:
+            columns["killing_unit_id"][row] = event.killing_unit_id
+
+    def add_unit_type_change(self, event):
+        self._set_type(self._row(event.unit_id), event.unit_type_name)
+
+    def add_unit_owner_change(self, event):
+        self.columns["owner"][self._row(event.unit_id)] = event.upkeep_pid
+
+    def type_names(self):
+        """Returns the unit type name of each row."""
+        unit_types = self.unit_types
+        return [unit_types[index] for index in self.columns["type"]]
+
+    def to_numpy(self):
+        """
+        Replaces the columns with numpy arrays of the same type. Nothing can
+        be added afterwards. Raises ImportError if numpy isn't installed.
+        """
+        import numpy
+
+        for name, column in self.columns.items():
+            self.columns[name] = numpy.array(column)
+        return self
+
+    def _row(self, unit_id):
+        row = self.rows.get(unit_id)
+        if row is None:
+            row = self.rows[unit_id] = len(self.rows)
+            for column in self.columns.values():
+                column.append(-1)
+            self.columns["unit_id"][row] = unit_id
+        return row
+
+    def _set_type(self, row, unit_type_name):
+        index = self._type_index.get(unit_type_name)
+        if index is None:
+            index = self._type_index[unit_type_name] = len(self.unit_types)
+            self.unit_types.append(unit_type_name)
+        self.columns["type"][row] = index
+
+
+class UnitLifecycleTracker(object):
+    """
+    Builds ``replay.unit_table``, a :class:`UnitTable` of all the units in
+    the replay. Only the tracker events are used, so the plugin can run on
+    its own in an engine without :class:`ContextLoader`.
+
+    :param use_numpy: Turn the columns into numpy arrays at the end of the
+        game when numpy is installed.
+    """
+
+    name = "UnitLifecycleTracker"
+
+    def __init__(self, use_numpy=True):
+        self.use_numpy = use_numpy
+
+    def handleInitGame(self, event, replay):
+        replay.unit_table = UnitTable()
+
+    def handleUnitBornEvent(self, event, replay):
+        replay.unit_table.add_unit_born(event)
+
+    def handleUnitInitEvent(self, event, replay):
+        replay.unit_table.add_unit_init(event)
+
+    def handleUnitDoneEvent(self, event, replay):
+        replay.unit_table.add_unit_done(event)
+
+    def handleUnitDiedEvent(self, event, replay):
+        replay.unit_table.add_unit_died(event)
+
+    def handleUnitTypeChangeEvent(self, event, replay):
+        replay.unit_table.add_unit_type_change(event)
+
+    def handleUnitOwnerChangeEvent(self, event, replay):
+        replay.unit_table.add_unit_owner_change(event)
+
+    def handleEndGame(self, event, replay):
+        if self.use_numpy:
+            try:
+                replay.unit_table.to_numpy()
+            except ImportError:
+                pass
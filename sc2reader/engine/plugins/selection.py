@@ -22,11 +22,22 @@ class SelectionTracker(object):
             control_group_9 = selection[9]
             active_selection = selection[10]
 
+    Selections are sorted by unit id and never changed in place, a change
+    makes a new list, so control groups and the history below share them.
+    Unless created with ``history=False`` the selections of each control
+    group are also kept by frame, see
+    :meth:`~sc2reader.objects.Entity.selection_at`::
+
+        army = person.selection_at(frame, 1)
+
     # TODO: list a few error inducing situations
     """
 
     name = "SelectionTracker"
 
+    def __init__(self, history=True):
+        self.history = history
+
     def handleInitGame(self, event, replay):
         for person in replay.entities:
             person.selection = dict()
@@ -34,13 +45,20 @@ class SelectionTracker(object):
                 person.selection[i] = list()
             person.selection_errors = 0
 
+            # The frames each control group changed on and its selections
+            person.selection_history = None
+            if self.history:
+                person.selection_history = dict(
+                    (i, ([0], [selection])) for i, selection in person.selection.items()
+                )
+
     def handleSelectionEvent(self, event, replay):
         selection = event.player.selection[event.control_group]
         new_selection, error = self._deselect(
             selection, event.mask_type, event.mask_data
         )
         new_selection = self._select(new_selection, event.objects)
-        event.player.selection[event.control_group] = new_selection
+        self._set(event, event.control_group, new_selection)
         if error:
             event.player.selection_errors += 1
 
@@ -49,12 +67,12 @@ class SelectionTracker(object):
         new_selection, error = self._deselect(
             selection, event.mask_type, event.mask_data
         )
-        event.player.selection[10] = new_selection
+        self._set(event, 10, new_selection)
         if error:
             event.player.selection_errors += 1
 
     def handleSetControlGroupEvent(self, event, replay):
-        event.player.selection[event.control_group] = event.player.selection[10]
+        self._set(event, event.control_group, event.player.selection[10])
 
     def handleAddToControlGroupEvent(self, event, replay):
         selection = event.player.selection[event.control_group]
@@ -62,12 +80,33 @@ class SelectionTracker(object):
             selection, event.mask_type, event.mask_data
         )
         new_selection = self._select(new_selection, event.player.selection[10])
-        event.player.selection[event.control_group] = new_selection
+        self._set(event, event.control_group, new_selection)
         if error:
             event.player.selection_errors += 1
 
+    def _set(self, event, control_group, selection):
+        person = event.player
+        if person.selection[control_group] is selection:
+            return
+        person.selection[control_group] = selection
+
+        if person.selection_history is not None:
+            frames, selections = person.selection_history[control_group]
+            if frames[-1] == event.frame:
+                selections[-1] = selection
+            else:
+                frames.append(event.frame)
+                selections.append(selection)
+
     def _select(self, selection, units):
-        return sorted(set(selection + units))
+        if not units:
+            return selection
+
+        # Units are ordered by id, sorting on the ids themselves saves the
+        # unit comparisons. Units that are already selected are kept.
+        by_id = dict((unit.id, unit) for unit in units)
+        by_id.update((unit.id, unit) for unit in selection)
+        return [by_id[unit_id] for unit_id in sorted(by_id)]
 
     def _deselect(self, selection, mode, data):
         """
@@ -79,22 +118,20 @@ class SelectionTracker(object):
         selection_size, data_size = len(selection), len(data)
 
         if mode == "Mask":
-            # Deselect objects according to deselect mask
-            sfilter = lambda bit_u: not bit_u[0]
-            mask = data + [False] * (selection_size - data_size)
-            new_selection = [u for (bit, u) in filter(sfilter, zip(mask, selection))]
+            # Deselect objects according to deselect mask, objects past the
+            # end of the mask stay selected
+            new_selection = [u for (bit, u) in zip(data, selection) if not bit]
+            new_selection.extend(selection[data_size:])
             error = data_size > selection_size
 
         elif mode == "OneIndices":
             # Deselect objects according to indexes
-            clean_data = list(filter(lambda i: i < selection_size, data))
-            new_selection = [u for i, u in enumerate(selection) if i < selection_size]
-            error = len(list(filter(lambda i: i >= selection_size, data))) != 0
+            new_selection = selection
+            error = any(i >= selection_size for i in data)
 
         elif mode == "ZeroIndices":
             # Select objects according to indexes
-            clean_data = list(filter(lambda i: i < selection_size, data))
-            new_selection = [selection[i] for i in clean_data]
-            error = len(clean_data) != data_size
+            new_selection = [selection[i] for i in data if i < selection_size]
+            error = len(new_selection) != data_size
 
         return new_selection, error
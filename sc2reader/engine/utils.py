@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function, unicode_literals, division
 
-from bisect import bisect_left
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from io import BytesIO
+import pickle
 
 
 class GameState(dict):
@@ -43,3 +46,244 @@ class GameState(dict):
             self._frameset.add(frame)
 
         super(GameState, self).__setitem__(frame, value)
+
+
+class HandlerStats(object):
+    """The calls to one plugin event handler and the time spent in them"""
+
+    __slots__ = ("calls", "total_time", "max_time", "yielded")
+
+    def __init__(self):
+        #: The number of times the handler was called
+        self.calls = 0
+
+        #: The wall time spent in the handler, in seconds
+        self.total_time = 0.0
+
+        #: The longest single call, in seconds
+        self.max_time = 0.0
+
+        #: The number of events the handler yielded
+        self.yielded = 0
+
+    def add(self, elapsed, yielded):
+        self.calls += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        self.yielded += yielded
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.yielded += other.yielded
+
+    def __repr__(self):
+        return (
+            "HandlerStats(calls={0}, total_time={1:.6f}, max_time={2:.6f}, "
+            "yielded={3})".format(
+                self.calls, self.total_time, self.max_time, self.yielded
+            )
+        )
+
+
+class PluginProfile(dict):
+    """
+    The handler calls recorded by a profiling
+    :class:`~sc2reader.engine.engine.GameEngine`, as a dict of
+    ``{plugin_name: {handler_name: HandlerStats}}``. Profiles of many
+    replays can be added up with :meth:`merge`.
+    """
+
+    def record(self, handler, elapsed, yielded):
+        plugin_name = handler.__self__.name
+        handlers = self.get(plugin_name)
+        if handlers is None:
+            handlers = self[plugin_name] = dict()
+        stats = handlers.get(handler.__name__)
+        if stats is None:
+            stats = handlers[handler.__name__] = HandlerStats()
+        stats.add(elapsed, yielded)
+
+    def merge(self, other):
+        """Adds the calls recorded in another profile to this one."""
+        for plugin_name, handlers in other.items():
+            for handler_name, stats in handlers.items():
+                mine = self.setdefault(plugin_name, dict()).get(handler_name)
+                if mine is None:
+                    mine = self[plugin_name][handler_name] = HandlerStats()
+                mine.merge(stats)
+        return self
+
+    def plugin_totals(self):
+        """Returns a dict of plugin name to the HandlerStats of all its handlers."""
+        totals = dict()
+        for plugin_name, handlers in self.items():
+            total = totals[plugin_name] = HandlerStats()
+            for stats in handlers.values():
+                total.merge(stats)
+        return totals
+
+
+#: The state of a run at one point, taken before the event at ``position``
+#: in ``replay.events`` was handled. ``frame`` is the frame of that event,
+#: ``plugins`` the indexes of the plugins still running and ``state`` the
+#: pickled replay and plugin attributes.
+EngineCheckpoint = namedtuple("EngineCheckpoint", "frame position plugins state")
+
+
+class EngineCheckpoints(list):
+    """
+    The :class:`EngineCheckpoint` list of a run, in frame order, taken by a
+    :class:`~sc2reader.engine.engine.GameEngine` created with
+    ``checkpoint_frames``. Events, the replay and datapack entries are
+    pickled as references, so the checkpoints are small next to the replay
+    and can be saved and loaded in another process to seek the same replay.
+    """
+
+    #: Replay attributes that the engine plugins don't change and that are
+    #: left out of the checkpoints.
+    skipped_attributes = frozenset(
+        [
+            "_event_index",
+            "archive",
+            "datapack",
+            "engine_checkpoints",
+            "events",
+            "factory",
+            "game_events",
+            "has_tracker_events",
+            "logger",
+            "map",
+            "map_file",
+            "message_events",
+            "messages",
+            "opt",
+            "packets",
+            "pings",
+            "plugin_profile",
+            "raw_data",
+            "registered_datapacks",
+            "registered_readers",
+            "tracker_events",
+        ]
+    )
+
+    def __init__(self, frames, plugin_names=(), filehash=None):
+        super(EngineCheckpoints, self).__init__()
+
+        #: The number of frames between checkpoints
+        self.frames = frames
+
+        #: The names of the engine plugins, in order
+        self.plugin_names = tuple(plugin_names)
+
+        #: The hash of the replay file the checkpoints were taken on
+        self.filehash = filehash
+
+        self._position = -1
+        self._next_frame = 0
+        self._shared_ids = None
+
+    def update(self, replay, plugins, active, event):
+        # Called with each event the engine takes from the replay, starting
+        # with InitGame. A checkpoint is taken before the first event of
+        # every frames long stretch, while nothing else is queued.
+        position = self._position
+        self._position += 1
+        frame = getattr(event, "frame", None)
+        if position < 0 or frame is None or frame < self._next_frame:
+            return
+
+        if self._shared_ids is None:
+            self._shared_ids = dict(
+                (id(obj), index) for index, obj in enumerate(shared_objects(replay))
+            )
+        indexes = [
+            index
+            for index, plugin in enumerate(plugins)
+            if any(plugin is other for other in active)
+        ]
+        state = (
+            dict(
+                (key, value)
+                for key, value in replay.__dict__.items()
+                if key not in self.skipped_attributes
+            ),
+            [plugins[index].__dict__ for index in indexes],
+        )
+        buf = BytesIO()
+        _CheckpointPickler(buf, self._shared_ids).dump(state)
+        self.append(EngineCheckpoint(frame, position, indexes, buf.getvalue()))
+        self._next_frame = (frame // self.frames + 1) * self.frames
+
+    def find(self, frame):
+        """Returns the last checkpoint at or before the frame, or None."""
+        index = bisect_right([checkpoint.frame for checkpoint in self], frame)
+        return self[index - 1] if index else None
+
+    def restore(self, checkpoint, replay, plugins):
+        """
+        Puts the replay and plugin attributes back as they were at the
+        checkpoint and returns the plugins that were still running.
+        """
+        unpickler = _CheckpointUnpickler(
+            BytesIO(checkpoint.state), shared_objects(replay)
+        )
+        replay_state, plugin_states = unpickler.load()
+        replay.__dict__.update(replay_state)
+        active = [plugins[index] for index in checkpoint.plugins]
+        for plugin, plugin_state in zip(active, plugin_states):
+            plugin.__dict__.clear()
+            plugin.__dict__.update(plugin_state)
+        return active
+
+    def save(self, file_object):
+        """Writes the checkpoints to a file object or path."""
+        if not hasattr(file_object, "write"):
+            with open(file_object, "wb") as file_object:
+                return self.save(file_object)
+        pickle.dump(self, file_object, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file_object):
+        """Reads checkpoints written by :meth:`save` from a file object or path."""
+        if not hasattr(file_object, "read"):
+            with open(file_object, "rb") as file_object:
+                return cls.load(file_object)
+        return pickle.load(file_object)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shared_ids"] = None
+        return state
+
+
+def shared_objects(replay):
+    # The objects that checkpoints refer to by index instead of copying,
+    # in the same order in every process that loads the replay.
+    objects = [replay]
+    objects.extend(replay.events)
+    if replay.datapack is not None:
+        objects.extend(replay.datapack.units.values())
+        objects.extend(replay.datapack.abilities.values())
+    return objects
+
+
+class _CheckpointPickler(pickle.Pickler):
+    def __init__(self, file_object, shared_ids):
+        pickle.Pickler.__init__(self, file_object, pickle.HIGHEST_PROTOCOL)
+        self.shared_ids = shared_ids
+
+    def persistent_id(self, obj):
+        return self.shared_ids.get(id(obj))
+
+
+class _CheckpointUnpickler(pickle.Unpickler):
+    def __init__(self, file_object, shared):
+        pickle.Unpickler.__init__(self, file_object)
+        self.shared = shared
+
+    def persistent_load(self, pid):
+        return self.shared[pid]
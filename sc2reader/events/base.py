@@ -2,5 +2,52 @@
 from __future__ import absolute_import, print_function, unicode_literals, division
 
 
+class EventName(object):
+    """The name of the event class, looked up on the class of each event."""
+
+    def __get__(self, event, cls):
+        return cls.__name__
+
+
 class Event(object):
-    name = "Event"
+    """
+    The base class of all events. Events keep their attributes in slots,
+    declared by each event class, to keep replays with many events small.
+    Anything else attached to an event, by plugins for instance, goes in the
+    ``__dict__`` slot as usual.
+    """
+
+    __slots__ = ("__dict__",)
+
+    #: Short cut string for event class name
+    name = EventName()
+
+    def __getstate__(self):
+        # Python 2 only pickles classes with slots at protocol 2 and above
+        # unless they provide their own state, so the slots are saved here.
+        slots = dict()
+        for name in _slot_names(type(self)):
+            if hasattr(self, name):
+                slots[name] = getattr(self, name)
+        return self.__dict__, slots
+
+    def __setstate__(self, state):
+        values, slots = state
+        self.__dict__.update(values)
+        for name, value in slots.items():
+            setattr(self, name, value)
+
+
+#: The slots declared by each event class and its bases, by class
+_class_slots = dict()
+
+
+def _slot_names(cls):
+    if cls not in _class_slots:
+        _class_slots[cls] = [
+            name
+            for base in cls.__mro__
+            for name in getattr(base, "__slots__", ())
+            if name != "__dict__"
+        ]
+    return _class_slots[cls]
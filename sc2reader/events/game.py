@@ -7,6 +7,11 @@ from sc2reader.log_utils import loggable
 
 from itertools import chain
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 
 @loggable
 class GameEvent(Event):
@@ -14,6 +19,8 @@ class GameEvent(Event):
     This is the base class for all game events. The attributes below are universally available.
     """
 
+    __slots__ = ("pid", "player", "frame", "second", "is_local")
+
     def __init__(self, frame, pid):
         #: The id of the player generating the event. This is 16 for global non-player events.
         #: Prior to Heart of the Swarm this was the player id. Since HotS it is
@@ -34,9 +41,6 @@ class GameEvent(Event):
         #: A flag indicating if it is a local or global event.
         self.is_local = pid != 16
 
-        #: Short cut string for event class name
-        self.name = self.__class__.__name__
-
     def _str_prefix(self):
         if getattr(self, "pid", 16) == 16:
             player_name = "Global"
@@ -60,6 +64,8 @@ class GameStartEvent(GameEvent):
     event.
     """
 
+    __slots__ = ("data",)
+
     def __init__(self, frame, pid, data):
         super(GameStartEvent, self).__init__(frame, pid)
 
@@ -72,6 +78,8 @@ class PlayerLeaveEvent(GameEvent):
     Recorded when a player leaves the game.
     """
 
+    __slots__ = ("data",)
+
     def __init__(self, frame, pid, data):
         super(PlayerLeaveEvent, self).__init__(frame, pid)
 
@@ -85,6 +93,18 @@ class UserOptionsEvent(GameEvent):
     :class:`GameStartEvent`.
     """
 
+    __slots__ = (
+        "game_fully_downloaded",
+        "development_cheats_enabled",
+        "multiplayer_cheats_enabled",
+        "sync_checksumming_enabled",
+        "is_map_to_map_transition",
+        "use_ai_beacons",
+        "starting_rally",
+        "debug_pause_enabled",
+        "base_build_num",
+    )
+
     def __init__(self, frame, pid, data):
         super(UserOptionsEvent, self).__init__(frame, pid)
         #:
@@ -132,6 +152,53 @@ def create_command_event(frame, pid, data):
         return DataCommandEvent(frame, pid, data)
 
 
+class CommandFlags(Mapping):
+    """A read only view of the command flags by name, see :attr:`CommandEvent.flag`"""
+
+    __slots__ = ("flags",)
+
+    #: The bit of each flag
+    bits = dict(
+        alternate=0x1,
+        queued=0x2,
+        preempt=0x4,
+        smart_click=0x8,
+        smart_rally=0x10,
+        subgroup=0x20,
+        set_autocast=0x40,
+        set_autocast_on=0x80,
+        user=0x100,
+        data_a=0x200,
+        data_passenger=0x200,  # alt-name
+        data_b=0x400,
+        data_abil_queue_order_id=0x400,  # alt-name
+        ai=0x800,
+        ai_ignore_on_finish=0x1000,
+        is_order=0x2000,
+        script=0x4000,
+        homogenous_interruption=0x8000,
+        minimap=0x10000,
+        repeat=0x20000,
+        dispatch_to_other_unit=0x40000,
+        target_self=0x80000,
+    )
+
+    def __init__(self, flags):
+        self.flags = flags
+
+    def __getitem__(self, name):
+        return self.bits[name] & self.flags != 0
+
+    def __iter__(self):
+        return iter(self.bits)
+
+    def __len__(self):
+        return len(self.bits)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 @loggable
 class CommandEvent(GameEvent):
     """
@@ -144,62 +211,27 @@ class CommandEvent(GameEvent):
     :class:`DataCommandEvent` for individual details.
     """
 
+    __slots__ = (
+        "flags",
+        "has_ability",
+        "ability_link",
+        "command_index",
+        "ability_data",
+        "ability_id",
+        "ability",
+        "ability_name",
+        "ability_type",
+        "ability_type_data",
+        "other_unit_id",
+        "other_unit",
+    )
+
     def __init__(self, frame, pid, data):
         super(CommandEvent, self).__init__(frame, pid)
 
         #: Flags on the command???
         self.flags = data["flags"]
 
-        #: A dictionary of possible ability flags. Flags are:
-        #:
-        #: * alternate
-        #: * queued
-        #: * preempt
-        #: * smart_click
-        #: * smart_rally
-        #: * subgroup
-        #: * set_autocast,
-        #: * set_autocast_on
-        #: * user
-        #: * data_a
-        #: * data_b
-        #: * data_passenger
-        #: * data_abil_queue_order_id,
-        #: * ai
-        #: * ai_ignore_on_finish
-        #: * is_order
-        #: * script
-        #: * homogenous_interruption,
-        #: * minimap
-        #: * repeat
-        #: * dispatch_to_other_unit
-        #: * target_self
-        #:
-        self.flag = dict(
-            alternate=0x1 & self.flags != 0,
-            queued=0x2 & self.flags != 0,
-            preempt=0x4 & self.flags != 0,
-            smart_click=0x8 & self.flags != 0,
-            smart_rally=0x10 & self.flags != 0,
-            subgroup=0x20 & self.flags != 0,
-            set_autocast=0x40 & self.flags != 0,
-            set_autocast_on=0x80 & self.flags != 0,
-            user=0x100 & self.flags != 0,
-            data_a=0x200 & self.flags != 0,
-            data_passenger=0x200 & self.flags != 0,  # alt-name
-            data_b=0x400 & self.flags != 0,
-            data_abil_queue_order_id=0x400 & self.flags != 0,  # alt-name
-            ai=0x800 & self.flags != 0,
-            ai_ignore_on_finish=0x1000 & self.flags != 0,
-            is_order=0x2000 & self.flags != 0,
-            script=0x4000 & self.flags != 0,
-            homogenous_interruption=0x8000 & self.flags != 0,
-            minimap=0x10000 & self.flags != 0,
-            repeat=0x20000 & self.flags != 0,
-            dispatch_to_other_unit=0x40000 & self.flags != 0,
-            target_self=0x80000 & self.flags != 0,
-        )
-
         #: Flag marking that the command had ability information
         self.has_ability = data["ability"] is not None
 
@@ -237,6 +269,36 @@ class CommandEvent(GameEvent):
         #: A reference to the other unit
         self.other_unit = None
 
+    @property
+    def flag(self):
+        """
+        A dictionary of possible ability flags, read from :attr:`flags`. Flags are:
+
+        * alternate
+        * queued
+        * preempt
+        * smart_click
+        * smart_rally
+        * subgroup
+        * set_autocast,
+        * set_autocast_on
+        * user
+        * data_a
+        * data_b
+        * data_passenger
+        * data_abil_queue_order_id,
+        * ai
+        * ai_ignore_on_finish
+        * is_order
+        * script
+        * homogenous_interruption,
+        * minimap
+        * repeat
+        * dispatch_to_other_unit
+        * target_self
+        """
+        return CommandFlags(self.flags)
+
     def __str__(self):
         string = self._str_prefix()
         if self.has_ability:
@@ -267,6 +329,8 @@ class BasicCommandEvent(CommandEvent):
     of whether or not the command was successful.
     """
 
+    __slots__ = ()
+
     def __init__(self, frame, pid, data):
         super(BasicCommandEvent, self).__init__(frame, pid, data)
 
@@ -283,6 +347,8 @@ class TargetPointCommandEvent(CommandEvent):
     of whether or not the command was successful.
     """
 
+    __slots__ = ("x", "y", "z", "location")
+
     def __init__(self, frame, pid, data):
         super(TargetPointCommandEvent, self).__init__(frame, pid, data)
 
@@ -311,6 +377,21 @@ class TargetUnitCommandEvent(CommandEvent):
     of whether or not the command was successful.
     """
 
+    __slots__ = (
+        "target_flags",
+        "target_timer",
+        "target_unit_id",
+        "target_unit",
+        "target_unit_type",
+        "control_player_id",
+        "upkeep_player_id",
+        "x",
+        "y",
+        "z",
+        "location",
+        "target",
+    )
+
     def __init__(self, frame, pid, data):
         super(TargetUnitCommandEvent, self).__init__(frame, pid, data)
 
@@ -362,7 +443,7 @@ class UpdateTargetPointCommandEvent(TargetPointCommandEvent):
 
     """
 
-    name = "UpdateTargetPointCommandEvent"
+    __slots__ = ()
 
 
 class UpdateTargetUnitCommandEvent(TargetUnitCommandEvent):
@@ -378,7 +459,7 @@ class UpdateTargetUnitCommandEvent(TargetUnitCommandEvent):
     holding shift, and then shift clicking on a second hatchery.
     """
 
-    name = "UpdateTargetUnitCommandEvent"
+    __slots__ = ()
 
 
 class DataCommandEvent(CommandEvent):
@@ -392,6 +473,8 @@ class DataCommandEvent(CommandEvent):
     of whether or not the command was successful.
     """
 
+    __slots__ = ("target_data",)
+
     def __init__(self, frame, pid, data):
         super(DataCommandEvent, self).__init__(frame, pid, data)
 
@@ -412,6 +495,19 @@ class SelectionEvent(GameEvent):
     a :class:`ControlGroupEvent` is generated.
     """
 
+    __slots__ = (
+        "control_group",
+        "bank",
+        "subgroup_index",
+        "mask_type",
+        "mask_data",
+        "new_unit_types",
+        "new_unit_ids",
+        "new_unit_info",
+        "new_units",
+        "objects",
+    )
+
     def __init__(self, frame, pid, data):
         super(SelectionEvent, self).__init__(frame, pid)
 
@@ -533,6 +629,15 @@ class ControlGroupEvent(GameEvent):
     See the class entry for details.
     """
 
+    __slots__ = (
+        "control_group",
+        "bank",
+        "hotkey",
+        "update_type",
+        "mask_type",
+        "mask_data",
+    )
+
     def __init__(self, frame, pid, data):
         super(ControlGroupEvent, self).__init__(frame, pid)
 
@@ -563,6 +668,8 @@ class SetControlGroupEvent(ControlGroupEvent):
     with the player's current selection. This event doesn't have masks set.
     """
 
+    __slots__ = ()
+
 
 class AddToControlGroupEvent(SetControlGroupEvent):
     """
@@ -571,6 +678,8 @@ class AddToControlGroupEvent(SetControlGroupEvent):
     This event adds the current selection to the control group.
     """
 
+    __slots__ = ()
+
 
 class GetControlGroupEvent(ControlGroupEvent):
     """
@@ -582,6 +691,8 @@ class GetControlGroupEvent(ControlGroupEvent):
     inside the medivac they cannot be part of your selection.
     """
 
+    __slots__ = ()
+
 
 @loggable
 class CameraEvent(GameEvent):
@@ -591,6 +702,8 @@ class CameraEvent(GameEvent):
     state of the camera after changing.
     """
 
+    __slots__ = ("x", "y", "location", "distance", "pitch", "yaw")
+
     def __init__(self, frame, pid, data):
         super(CameraEvent, self).__init__(frame, pid)
 
@@ -625,6 +738,18 @@ class ResourceTradeEvent(GameEvent):
     resource requests.
     """
 
+    __slots__ = (
+        "sender_id",
+        "sender",
+        "recipient_id",
+        "recipient",
+        "resources",
+        "minerals",
+        "vespene",
+        "terrazine",
+        "custom_resource",
+    )
+
     def __init__(self, frame, pid, data):
         super(ResourceTradeEvent, self).__init__(frame, pid)
 
@@ -670,6 +795,8 @@ class ResourceRequestEvent(GameEvent):
     Generated when a player creates a resource request.
     """
 
+    __slots__ = ("resources", "minerals", "vespene", "terrazon", "custom_resource")
+
     def __init__(self, frame, pid, data):
         super(ResourceRequestEvent, self).__init__(frame, pid)
 
@@ -702,6 +829,8 @@ class ResourceRequestFulfillEvent(GameEvent):
     Generated when a player accepts a resource request.
     """
 
+    __slots__ = ("request_id",)
+
     def __init__(self, frame, pid, data):
         super(ResourceRequestFulfillEvent, self).__init__(frame, pid)
 
@@ -714,6 +843,8 @@ class ResourceRequestCancelEvent(GameEvent):
     Generated when a player cancels their resource request.
     """
 
+    __slots__ = ("request_id",)
+
     def __init__(self, frame, pid, data):
         super(ResourceRequestCancelEvent, self).__init__(frame, pid)
 
@@ -726,6 +857,8 @@ class HijackReplayGameEvent(GameEvent):
     Generated when players take over from a replay.
     """
 
+    __slots__ = ("method", "user_infos")
+
     def __init__(self, frame, pid, data):
         super(HijackReplayGameEvent, self).__init__(frame, pid)
 
@@ -12,6 +12,8 @@ class MessageEvent(Event):
     Parent class for all message events.
     """
 
+    __slots__ = ("pid", "frame", "second", "player")
+
     def __init__(self, frame, pid):
         #: The user id (or player id for older replays) of the person that generated the event.
         self.pid = pid
@@ -22,9 +24,6 @@ class MessageEvent(Event):
         #: The second of the game (game time not real time) this event was applied
         self.second = frame >> 4
 
-        #: Short cut string for event class name
-        self.name = self.__class__.__name__
-
     def _str_prefix(self):
         player_name = self.player.name if getattr(self, "pid", 16) != 16 else "Global"
         return "{0}\t{1:<15} ".format(Length(seconds=int(self.frame / 16)), player_name)
@@ -39,6 +38,8 @@ class ChatEvent(MessageEvent):
     Records in-game chat events.
     """
 
+    __slots__ = ("target", "text", "to_all", "to_allies", "to_observers")
+
     def __init__(self, frame, pid, target, text):
         super(ChatEvent, self).__init__(frame, pid)
         #: The numerical target type. 0 = to all; 2 = to allies; 4 = to observers.
@@ -63,6 +64,8 @@ class ProgressEvent(MessageEvent):
     Sent during the load screen to update load process for other clients.
     """
 
+    __slots__ = ("progress",)
+
     def __init__(self, frame, pid, progress):
         super(ProgressEvent, self).__init__(frame, pid)
 
@@ -76,6 +79,8 @@ class PingEvent(MessageEvent):
     Records pings made by players in game.
     """
 
+    __slots__ = ("target", "to_all", "to_allies", "to_observers", "x", "y", "location")
+
     def __init__(self, frame, pid, target, x, y):
         super(PingEvent, self).__init__(frame, pid)
 
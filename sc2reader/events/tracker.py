@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function, unicode_literals, division
 
+import array
+import bisect
 import functools
 
 from sc2reader.events.base import Event
-from sc2reader.utils import Length
+from sc2reader.utils import Length, decode_blob
 
 clamp = functools.partial(max, 0)
 
@@ -14,6 +16,8 @@ class TrackerEvent(Event):
     Parent class for all tracker events.
     """
 
+    __slots__ = ("frame", "second")
+
     def __init__(self, frames):
         #: The frame of the game this event was applied
         #: Ignore all but the lowest 32 bits of the frame
@@ -22,9 +26,6 @@ class TrackerEvent(Event):
         #: The second of the game (game time not real time) this event was applied
         self.second = self.frame >> 4
 
-        #: Short cut string for event class name
-        self.name = self.__class__.__name__
-
     def load_context(self, replay):
         pass
 
@@ -38,6 +39,8 @@ class TrackerEvent(Event):
 class PlayerSetupEvent(TrackerEvent):
     """Sent during game setup to help us organize players better"""
 
+    __slots__ = ("pid", "type", "uid", "sid")
+
     def __init__(self, frames, data, build):
         super(PlayerSetupEvent, self).__init__(frames)
 
@@ -67,6 +70,107 @@ class PlayerStatsEvent(TrackerEvent):
     end of the game. One for leaving and one for the  end of the game.
     """
 
+    __slots__ = (
+        "pid",
+        "player",
+        "stats",
+        "minerals_current",
+        "vespene_current",
+        "minerals_collection_rate",
+        "vespene_collection_rate",
+        "workers_active_count",
+        "minerals_used_in_progress_army",
+        "minerals_used_in_progress_economy",
+        "minerals_used_in_progress_technology",
+        "minerals_used_in_progress",
+        "vespene_used_in_progress_army",
+        "vespene_used_in_progress_economy",
+        "vespene_used_in_progress_technology",
+        "vespene_used_in_progress",
+        "resources_used_in_progress",
+        "minerals_used_current_army",
+        "minerals_used_current_economy",
+        "minerals_used_current_technology",
+        "minerals_used_current",
+        "vespene_used_current_army",
+        "vespene_used_current_economy",
+        "vespene_used_current_technology",
+        "vespene_used_current",
+        "resources_used_current",
+        "minerals_lost_army",
+        "minerals_lost_economy",
+        "minerals_lost_technology",
+        "minerals_lost",
+        "vespene_lost_army",
+        "vespene_lost_economy",
+        "vespene_lost_technology",
+        "vespene_lost",
+        "resources_lost",
+        "minerals_killed_army",
+        "minerals_killed_economy",
+        "minerals_killed_technology",
+        "minerals_killed",
+        "vespene_killed_army",
+        "vespene_killed_economy",
+        "vespene_killed_technology",
+        "vespene_killed",
+        "resources_killed",
+        "food_used",
+        "food_made",
+        "minerals_used_active_forces",
+        "vespene_used_active_forces",
+        "ff_minerals_lost_army",
+        "ff_minerals_lost_economy",
+        "ff_minerals_lost_technology",
+        "ff_vespene_lost_army",
+        "ff_vespene_lost_economy",
+        "ff_vespene_lost_technology",
+    )
+
+    #: The attribute set from each entry of :attr:`stats`, in order. The
+    #: friendly fire stats, the last six, are only recorded from build 26490.
+    stat_names = (
+        "minerals_current",
+        "vespene_current",
+        "minerals_collection_rate",
+        "vespene_collection_rate",
+        "workers_active_count",
+        "minerals_used_in_progress_army",
+        "minerals_used_in_progress_economy",
+        "minerals_used_in_progress_technology",
+        "vespene_used_in_progress_army",
+        "vespene_used_in_progress_economy",
+        "vespene_used_in_progress_technology",
+        "minerals_used_current_army",
+        "minerals_used_current_economy",
+        "minerals_used_current_technology",
+        "vespene_used_current_army",
+        "vespene_used_current_economy",
+        "vespene_used_current_technology",
+        "minerals_lost_army",
+        "minerals_lost_economy",
+        "minerals_lost_technology",
+        "vespene_lost_army",
+        "vespene_lost_economy",
+        "vespene_lost_technology",
+        "minerals_killed_army",
+        "minerals_killed_economy",
+        "minerals_killed_technology",
+        "vespene_killed_army",
+        "vespene_killed_economy",
+        "vespene_killed_technology",
+        "food_used",
+        "food_made",
+        "minerals_used_active_forces",
+        "vespene_used_active_forces",
+        "ff_minerals_lost_army",
+        "ff_minerals_lost_economy",
+        "ff_minerals_lost_technology",
+        "ff_vespene_lost_army",
+        "ff_vespene_lost_economy",
+        "ff_vespene_lost_technology",
+    )
+
     def __init__(self, frames, data, build):
         super(PlayerStatsEvent, self).__init__(frames)
 
@@ -278,6 +382,89 @@ class PlayerStatsEvent(TrackerEvent):
         return self._str_prefix() + "{0: >15} - Stats Update".format(str(self.player))
 
 
+class PlayerStatsTable(object):
+    """
+    :param build: The build of the replay the stats are from.
+
+    The :class:`PlayerStatsEvent` stats of a replay kept in columns instead of
+    events. Each player has a ``frame`` column and a column for every entry
+    in :attr:`PlayerStatsEvent.stat_names`, holding one value per stats
+    update in frame order. The values are clamped and food is scaled to
+    supply the same way as the event attributes. The totals the event adds
+    up from them are left out.
+
+    Columns are :class:`array.array` until :meth:`to_numpy` is called.
+    """
+
+    def __init__(self, build):
+        stat_names = PlayerStatsEvent.stat_names
+        if build < 26490:
+            stat_names = stat_names[:33]
+
+        #: The names of the columns of each player, in order
+        self.names = ("frame",) + stat_names
+
+        #: A dict of ``{name: column}`` for each pid with stats
+        self.players = dict()
+
+        self._typecodes = [
+            "d" if name in ("food_used", "food_made") else "l" for name in self.names
+        ]
+        self._food_indexes = (
+            self.names.index("food_used"),
+            self.names.index("food_made"),
+        )
+        self._columns = dict()
+
+    def add(self, frame, pid, stats):
+        """
+        Appends a stats update for the player. The stats are indexed like
+        :attr:`PlayerStatsEvent.stats`.
+        """
+        columns = self._columns.get(pid)
+        if columns is None:
+            columns = self._columns[pid] = [
+                array.array(typecode) for typecode in self._typecodes
+            ]
+            self.players[pid] = dict(zip(self.names, columns))
+
+        # Frames read from the archive are masked like TrackerEvent.frame
+        columns[0].append(frame % 2**32)
+        for index, column in enumerate(columns[1:]):
+            value = stats[index]
+            column.append(value if value > 0 else 0)
+
+        for index in self._food_indexes:
+            columns[index][-1] /= 4096.0
+
+    def columns(self, pid):
+        """
+        Returns the ``{name: column}`` dict of the player, empty if there are
+        no stats for the player.
+        """
+        return self.players.get(pid, dict())
+
+    def index_at(self, pid, frame):
+        """
+        Returns the index into the columns of the player of the last stats
+        update at or before the frame, or -1 if there is none.
+        """
+        frames = self.columns(pid).get("frame", [])
+        return bisect.bisect_right(frames, frame) - 1
+
+    def to_numpy(self):
+        """
+        Replaces the columns with numpy arrays of the same type. Nothing can
+        be added afterwards. Raises ImportError if numpy isn't installed.
+        """
+        import numpy
+
+        for pid, columns in self._columns.items():
+            columns[:] = [numpy.array(column) for column in columns]
+            self.players[pid] = dict(zip(self.names, columns))
+        return self
+
+
 class UnitBornEvent(TrackerEvent):
     """
     Generated when a unit is created in a finished state in the game. Examples include the Marine,
@@ -290,6 +477,21 @@ class UnitBornEvent(TrackerEvent):
     command.
     """
 
+    __slots__ = (
+        "unit_id_index",
+        "unit_id_recycle",
+        "unit_id",
+        "unit",
+        "unit_type_name",
+        "control_pid",
+        "upkeep_pid",
+        "unit_upkeeper",
+        "unit_controller",
+        "x",
+        "y",
+        "location",
+    )
+
     def __init__(self, frames, data, build):
         super(UnitBornEvent, self).__init__(frames)
 
@@ -306,7 +508,7 @@ class UnitBornEvent(TrackerEvent):
         self.unit = None
 
         #: The unit type name of the unit being born
-        self.unit_type_name = data[2].decode("utf8")
+        self.unit_type_name = decode_blob(data[2])
 
         #: The id of the player that controls this unit.
         self.control_pid = data[3]
@@ -348,6 +550,24 @@ class UnitDiedEvent(TrackerEvent):
     morphing, merging, and getting killed.
     """
 
+    __slots__ = (
+        "unit_id_index",
+        "unit_id_recycle",
+        "unit_id",
+        "unit",
+        "killer_pid",
+        "killer",
+        "killing_player_id",
+        "killing_player",
+        "x",
+        "y",
+        "location",
+        "killing_unit_index",
+        "killing_unit_recycle",
+        "killing_unit_id",
+        "killing_unit",
+    )
+
     def __init__(self, frames, data, build):
         super(UnitDiedEvent, self).__init__(frames)
 
@@ -423,6 +643,17 @@ class UnitOwnerChangeEvent(TrackerEvent):
     of an action that would generate this event.
     """
 
+    __slots__ = (
+        "unit_id_index",
+        "unit_id_recycle",
+        "unit_id",
+        "unit",
+        "control_pid",
+        "upkeep_pid",
+        "unit_upkeeper",
+        "unit_controller",
+    )
+
     def __init__(self, frames, data, build):
         super(UnitOwnerChangeEvent, self).__init__(frames)
 
@@ -463,6 +694,14 @@ class UnitTypeChangeEvent(TrackerEvent):
     be some other situations where a unit transformation is a type change and not a new unit.
     """
 
+    __slots__ = (
+        "unit_id_index",
+        "unit_id_recycle",
+        "unit_id",
+        "unit",
+        "unit_type_name",
+    )
+
     def __init__(self, frames, data, build):
         super(UnitTypeChangeEvent, self).__init__(frames)
 
@@ -479,7 +718,7 @@ class UnitTypeChangeEvent(TrackerEvent):
         self.unit = None
 
         #: The the new unit type name
-        self.unit_type_name = data[2].decode("utf8")
+        self.unit_type_name = decode_blob(data[2])
 
     def __str__(self):
         return self._str_prefix() + "{0: >15} - Unit {1} type changed to {2}".format(
@@ -492,6 +731,8 @@ class UpgradeCompleteEvent(TrackerEvent):
     Generated when a player completes an upgrade.
     """
 
+    __slots__ = ("pid", "player", "upgrade_type_name", "count")
+
     def __init__(self, frames, data, build):
         super(UpgradeCompleteEvent, self).__init__(frames)
 
@@ -502,7 +743,7 @@ class UpgradeCompleteEvent(TrackerEvent):
         self.player = None
 
         #: The name of the upgrade
-        self.upgrade_type_name = data[1].decode("utf8")
+        self.upgrade_type_name = decode_blob(data[1])
 
         #: The number of times this upgrade as been researched
         self.count = data[2]
@@ -520,6 +761,21 @@ class UnitInitEvent(TrackerEvent):
     Primary examples being buildings and warp-in units.
     """
 
+    __slots__ = (
+        "unit_id_index",
+        "unit_id_recycle",
+        "unit_id",
+        "unit",
+        "unit_type_name",
+        "control_pid",
+        "upkeep_pid",
+        "unit_upkeeper",
+        "unit_controller",
+        "x",
+        "y",
+        "location",
+    )
+
     def __init__(self, frames, data, build):
         super(UnitInitEvent, self).__init__(frames)
 
@@ -536,7 +792,7 @@ class UnitInitEvent(TrackerEvent):
         self.unit = None
 
         #: The the new unit type name
-        self.unit_type_name = data[2].decode("utf8")
+        self.unit_type_name = decode_blob(data[2])
 
         #: The id of the player that controls this unit.
         self.control_pid = data[3]
@@ -578,6 +834,8 @@ class UnitDoneEvent(TrackerEvent):
     unit is completed. E.g. warp-in finished, building finished, morph complete.
     """
 
+    __slots__ = ("unit_id_index", "unit_id_recycle", "unit_id", "unit")
+
     def __init__(self, frames, data, build):
         super(UnitDoneEvent, self).__init__(frames)
 
@@ -606,6 +864,8 @@ class UnitPositionsEvent(TrackerEvent):
     the remaining units are carried into the next interval.
     """
 
+    __slots__ = ("first_unit_index", "items", "units", "positions")
+
     def __init__(self, frames, data, build):
         super(UnitPositionsEvent, self).__init__(frames)
 
@@ -18,6 +18,18 @@ class MPQError(SC2ReaderError):
     pass
 
 
+class ReplayRejectedError(SC2ReaderError):
+    """Raised when a replay fails one of the ``where`` tests it was loaded with"""
+
+    def __init__(self, msg, load_level):
+        super(ReplayRejectedError, self).__init__(msg, load_level)
+        self.msg = msg
+        self.load_level = load_level
+
+    def __str__(self):
+        return self.msg
+
+
 class NoMatchingFilesError(SC2ReaderError):
     pass
 
@@ -45,3 +57,21 @@ class ProcessError(SC2ReaderError):
 
 class FileError(SC2ReaderError):
     pass
+
+
+class LoadError(SC2ReaderError):
+    """
+    Takes the place of a resource that failed to load in a parallel batch, see
+    :meth:`~sc2reader.factories.SC2Factory.load_all`. The original exception
+    is kept as text since it may not survive the trip between processes.
+    """
+
+    def __init__(self, source, error_type, error, traceback=None):
+        self.source = source
+        self.error_type = error_type
+        self.error = error
+        self.traceback = traceback
+        super(LoadError, self).__init__(source, error_type, error)
+
+    def __str__(self):
+        return "{0}: {1}: {2}".format(self.source, self.error_type, self.error)
@@ -4,3 +4,5 @@ from sc2reader.factories.sc2factory import SC2Factory
 from sc2reader.factories.sc2factory import FileCachedSC2Factory
 from sc2reader.factories.sc2factory import DictCachedSC2Factory
 from sc2reader.factories.sc2factory import DoubleCachedSC2Factory
+from sc2reader.factories.sc2factory import ParsedReplayCache
+from sc2reader.factories.filters import ReplayFilter
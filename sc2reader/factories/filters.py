@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, print_function, unicode_literals, division
+
+import functools
+
+
+class ReplayFilter(object):
+    """
+    :param load_level: The lowest load level with the data the test uses.
+    :param test: A function that takes the partly loaded replay and returns
+        True to keep loading it.
+
+    A test for the ``where`` load option. The test is run as soon as the
+    replay is loaded up to its load level, and the rest of the replay is
+    only loaded if it passes::
+
+        where = [
+            ReplayFilter(0, lambda replay: replay.build >= 80188),
+            ReplayFilter(2, lambda replay: replay.real_type == "1v1"),
+        ]
+        replays = sc2reader.load_replays("path/to/replays", where=where)
+
+    Plain functions can be used too. Unless they have a ``load_level``
+    attribute they are run once the replay is fully loaded and the engine
+    has run, so they can test what the engine plugins add, such as
+    ``avg_apm``, at the cost of loading every replay in full.
+    """
+
+    def __init__(self, load_level, test):
+        self.load_level = load_level
+        self.test = test
+
+    def __call__(self, replay):
+        return self.test(replay)
+
+
+def build_range(min_build=None, max_build=None):
+    """Keeps replays with a build between the given builds, inclusive."""
+    return ReplayFilter(0, functools.partial(_build_range, min_build, max_build))
+
+
+def map_name(*names):
+    """Keeps replays played on one of the maps."""
+    return ReplayFilter(1, functools.partial(_map_name, names))
+
+
+def game_type(*types):
+    """Keeps replays of one of the game types, such as ``"1v1"`` or ``"FFA"``."""
+    return ReplayFilter(2, functools.partial(_game_type, types))
+
+
+def ladder():
+    """Keeps ladder replays."""
+    return ReplayFilter(2, _ladder)
+
+
+def has_player(*names):
+    """Keeps replays with a player of one of the names."""
+    return ReplayFilter(2, functools.partial(_has_player, names))
+
+
+# The tests are module functions so the filters can be pickled for workers
+
+
+def _build_range(min_build, max_build, replay):
+    if min_build is not None and replay.build < min_build:
+        return False
+    return max_build is None or replay.build <= max_build
+
+
+def _map_name(names, replay):
+    return replay.map_name in names
+
+
+def _game_type(types, replay):
+    return replay.real_type in types
+
+
+def _ladder(replay):
+    return replay.is_ladder
+
+
+def _has_player(names, replay):
+    return any(player.name in names for player in replay.players)
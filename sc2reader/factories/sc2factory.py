@@ -18,12 +18,22 @@ else:
     from urllib.request import urlopen
     from urllib.parse import urlparse
 
+import hashlib
+import inspect
+import mmap
+import multiprocessing
+import pickle
 import re
 import time
+import traceback
+import zlib
 
+import sc2reader
 from sc2reader import utils
 from sc2reader import log_utils
+from sc2reader.exceptions import LoadError, ReplayRejectedError
 from sc2reader.resources import Resource, Replay, Map, GameSummary, Localization
+from sc2reader.resources import read_replay_header
 
 
 @log_utils.loggable
@@ -72,6 +82,13 @@ class SC2Factory(object):
     def __init__(self, **options):
         self.plugins = list()
 
+        #: A :class:`ParsedReplayCache` to check before parsing replays
+        self.parsed_cache = None
+
+        #: The number of replays the ``where`` tests rejected at each load
+        #: level during the last :meth:`load_all`
+        self.rejected = defaultdict(int)
+
         # Bootstrap with the default options
         self.options = defaultdict(dict)
         for cls, options in self.default_options.items():
@@ -89,12 +106,78 @@ class SC2Factory(object):
 
     def load_replays(self, sources, options=None, **new_options):
         """
-        Loads a collection of sc2replay files, returns a generator.
+        Loads a collection of sc2replay files, returns a generator. Pass
+        ``workers`` to load them in parallel, see :meth:`load_all`.
+
+        Pass ``where``, a list of tests such as
+        :class:`~sc2reader.factories.filters.ReplayFilter`, to only load the
+        replays that pass them all. Each test runs as soon as the replay is
+        loaded far enough for it and a replay that fails is dropped without
+        loading the rest of it. Tests without a load level run once the
+        replay is fully loaded and run through the engine, so they can use
+        what the engine plugins add. The counts of dropped replays by load
+        level are kept in :attr:`rejected`.
         """
         return self.load_all(
             Replay, sources, options, extension="SC2Replay", **new_options
         )
 
+    def scan_header(self, source, options=None, **new_options):
+        """
+        Reads just the version and length of a single sc2replay file and
+        returns a :class:`~sc2reader.resources.ReplayHeader`. Local files
+        are only read as far as the header.
+        """
+        options = options or self._get_options(Replay, **new_options)
+        if isinstance(source, basestring) and not re.match(r"https?://", source):
+            location = os.path.join(options.get("directory", ""), source)
+            with open(location, "rb") as replay_file:
+                return read_replay_header(replay_file, filename=source)
+
+        resource, filename = self._load_resource(source, options=options)
+        return read_replay_header(resource, filename=filename)
+
+    def scan_replays(
+        self,
+        sources,
+        options=None,
+        workers=None,
+        ordered=True,
+        chunksize=64,
+        **new_options
+    ):
+        """
+        Scans the headers of a collection of sc2replay files with
+        :meth:`scan_header`, returns a generator. The ``workers``,
+        ``ordered`` and ``chunksize`` parameters work like they do for
+        :meth:`load_all`, including yielding a
+        :class:`~sc2reader.exceptions.LoadError` for each file that fails
+        when scanning in parallel.
+        """
+        new_options.setdefault("extension", "SC2Replay")
+        options = options or self._get_options(Replay, **new_options)
+        if isinstance(sources, basestring):
+            sources = utils.get_files(sources, **options)
+
+        if not workers:
+            for source in sources:
+                yield self.scan_header(source, options=options)
+            return
+
+        pool = multiprocessing.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(self, Replay, options, None),
+        )
+        try:
+            imap = pool.imap if ordered else pool.imap_unordered
+            for result in imap(_scan_in_worker, sources, chunksize):
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
     def load_localization(self, source, options=None, **new_options):
         """
         Loads a single s2ml file. Accepts file path, url, or file object.
@@ -165,16 +248,104 @@ class SC2Factory(object):
         resource, filename = self._load_resource(source, options=options)
         return self._load(cls, resource, filename=filename, options=options)
 
-    def load_all(self, cls, sources, options=None, **new_options):
+    def load_all(
+        self,
+        cls,
+        sources,
+        options=None,
+        workers=None,
+        ordered=True,
+        chunksize=1,
+        mapper=None,
+        **new_options
+    ):
+        """
+        Loads a collection of resources, returns a generator.
+
+        :param workers: Load the resources in a pool of this many processes.
+            Each worker loads with its own copy of this factory, so with the
+            same options and plugins.
+        :param ordered: Yield the results in the order of the sources. Set
+            it to False to get each result as soon as it is ready.
+        :param chunksize: The number of sources handed to a worker at once.
+        :param mapper: A function applied to each loaded resource, the result
+            of which is yielded instead. Workers send back resources with
+            pickle, which is costly for a fully loaded replay, so mapping
+            them down to what is needed in the worker saves a lot of time.
+
+        When loading in parallel a resource that fails to load doesn't stop
+        the batch. A :class:`~sc2reader.exceptions.LoadError` describing the
+        failure is yielded in its place. The sources must be paths or urls,
+        and the options, plugins and mapper must be picklable on platforms
+        that don't fork.
+        """
         options = options or self._get_options(cls, **new_options)
-        for resource, filename in self._load_resources(sources, options=options):
-            yield self._load(cls, resource, filename=filename, options=options)
+        self.rejected = defaultdict(int)
+        if not workers:
+            for resource, filename in self._load_resources(sources, options=options):
+                try:
+                    resource = self._load(
+                        cls, resource, filename=filename, options=options
+                    )
+                except ReplayRejectedError as e:
+                    self.rejected[e.load_level] += 1
+                    continue
+                yield mapper(resource) if mapper else resource
+            return
+
+        # Paths to a folder are expanded here so workers get single files
+        if isinstance(sources, basestring):
+            sources = utils.get_files(sources, **options)
+
+        pool = multiprocessing.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(self, cls, options, mapper),
+        )
+        try:
+            imap = pool.imap if ordered else pool.imap_unordered
+            for result in imap(_load_in_worker, sources, chunksize):
+                if isinstance(result, ReplayRejectedError):
+                    self.rejected[result.load_level] += 1
+                    continue
+                if isinstance(result, Replay):
+                    # Replays are sent back without the worker's factory
+                    result.factory = self
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def use_parsed_cache(self, cache):
+        """
+        Loads replays through the given :class:`ParsedReplayCache`, replays
+        that were parsed before with the same options are read back from it.
+        Pass None to stop using the cache.
+        """
+        self.parsed_cache = cache
 
     # Internal Functions
     def _load(self, cls, resource, filename, options):
+        plugins = options.get("plugins", self._get_plugins(cls))
+        cache_key = None
+        if self.parsed_cache is not None and issubclass(cls, Replay):
+            cache_key = self.parsed_cache.get_key(resource, options, plugins)
+        if cache_key is not None:
+            obj = self.parsed_cache.get(cache_key)
+            if obj is not None:
+                obj.filename = filename
+                obj.factory = self
+                where = obj._get_where(options.get("where", []), obj.load_level)
+                obj._check_where(where, obj.load_level, after_engine=True)
+                return obj
+
         obj = cls(resource, filename=filename, factory=self, **options)
-        for plugin in options.get("plugins", self._get_plugins(cls)):
+        for plugin in plugins:
             obj = plugin(obj)
+
+        if cache_key is not None:
+            self.parsed_cache.set(cache_key, obj)
         return obj
 
     def _get_plugins(self, cls):
@@ -214,6 +385,17 @@ class SC2Factory(object):
         with open(location, "rb") as resource_file:
             return resource_file.read()
 
+    def map_local_resource(self, location, **options):
+        """
+        Returns a read only memory map of the file. Empty files can't be
+        mapped, their contents are returned in a BytesIO instead.
+        """
+        with open(location, "rb") as resource_file:
+            try:
+                return mmap.mmap(resource_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return BytesIO(resource_file.read())
+
     def _load_resource(self, resource, options=None, **new_options):
         """
         http links, filesystem locations, and file-like objects
@@ -224,17 +406,22 @@ class SC2Factory(object):
             resource = resource.url
 
         if isinstance(resource, basestring):
+            resource_name = resource
             if re.match(r"https?://", resource):
                 contents = self.load_remote_resource_contents(resource, **options)
 
+                # BytesIO implements a fuller file-like object
+                resource = BytesIO(contents)
+
             else:
                 directory = options.get("directory", "")
                 location = os.path.join(directory, resource)
-                contents = self.load_local_resource_contents(location, **options)
-
-            # BytesIO implements a fuller file-like object
-            resource_name = resource
-            resource = BytesIO(contents)
+                if options.get("memory_map", False):
+                    # Only the parts of the file that are read get paged in
+                    resource = self.map_local_resource(location, **options)
+                else:
+                    contents = self.load_local_resource_contents(location, **options)
+                    resource = BytesIO(contents)
 
         else:
             # Totally not designed for large files!!
@@ -250,6 +437,274 @@ class SC2Factory(object):
         return (resource, resource_name)
 
 
+@log_utils.loggable
+class ParsedReplayCache(object):
+    """
+    :param cache_dir: Local directory to cache parsed replays in, optional.
+    :param cache_max_size: The max number of parsed replays to hold in memory.
+
+    Caches fully loaded replays so that loading the same replay file again
+    doesn't need to parse it. Enable it with
+    :meth:`SC2Factory.use_parsed_cache`.
+
+    Replays are keyed by the sha256 of the file contents, the load options,
+    the factory and engine plugins and a fingerprint of the installed
+    sc2reader, which covers the readers and the datapacks. Any change to one
+    of these loads the replay from scratch. Replays are stored compressed,
+    both on the file system and in memory, so each load returns a fresh
+    copy. Replays that can't be pickled, for instance because a plugin
+    attached something that can't be, are not cached and a warning is
+    logged.
+
+    The fingerprint hashes every source and data file of the sc2reader
+    package, a couple of megabytes, so the first lookup in a process takes
+    a few milliseconds longer. It is computed once and shared by all
+    caches in the process.
+    """
+
+    #: Bump to invalidate all caches when the stored format changes
+    format_version = 1
+
+    #: Load options that don't change the loaded replay
+    ignored_options = set(
+        [
+            "debug",
+            "verbose",
+            "directory",
+            "extension",
+            "exclude",
+            "depth",
+            "followlinks",
+            "engine",
+            "plugins",
+            "memory_map",
+            "where",
+        ]
+    )
+
+    _fingerprint = None
+
+    def __init__(self, cache_dir=None, cache_max_size=0):
+        self.cache_dir = cache_dir and os.path.abspath(cache_dir)
+        if self.cache_dir and not os.path.isdir(self.cache_dir):
+            raise ValueError(
+                "cache_dir ({0}) must be an existing directory.".format(self.cache_dir)
+            )
+        self.cache_max_size = cache_max_size
+        self.cache_dict = dict()
+        self.cache_used = dict()
+
+    @classmethod
+    def get_fingerprint(cls):
+        """
+        Returns a hash of the sc2reader version and source and data files.
+
+        The files are read on the first call only, later calls in the same
+        process return the stored hash.
+        """
+        if ParsedReplayCache._fingerprint is None:
+            digest = hashlib.sha256(
+                "{0}:{1}:{2}".format(
+                    sc2reader.__version__, cls.format_version, sys.version_info[:2]
+                ).encode("utf8")
+            )
+            root = os.path.dirname(os.path.abspath(sc2reader.__file__))
+            for path in sorted(utils.get_files(root, exclude=["__pycache__"])):
+                if path.endswith((".pyc", ".pyo")):
+                    continue
+                digest.update(os.path.relpath(path, root).encode("utf8"))
+                with open(path, "rb") as source_file:
+                    digest.update(source_file.read())
+            ParsedReplayCache._fingerprint = digest.hexdigest()
+        return ParsedReplayCache._fingerprint
+
+    def get_key(self, resource, options, plugins):
+        """
+        Returns the key the replay is cached under with the given options,
+        or None when the options, plugins or engine have settings that
+        can't be described and the replay shouldn't be cached.
+        """
+        engine = options.get("engine", sc2reader.engine)
+        # The sc2reader.engine module runs the default engine
+        engine = getattr(engine.run, "__self__", engine)
+        try:
+            settings = [
+                "{0}={1}".format(name, _describe(value))
+                for name, value in sorted(options.items())
+                if name not in self.ignored_options
+            ]
+            settings.extend(_describe(plugin) for plugin in plugins)
+            settings.append("engine={0}".format(_describe(engine)))
+        except ValueError as e:
+            self.logger.warning("Not caching replay: {0}".format(e))
+            return None
+
+        filehash = utils.get_file_hash(resource)
+
+        digest = hashlib.sha256(self.get_fingerprint().encode("utf8"))
+        digest.update("\n".join(settings).encode("utf8"))
+        return "{0}-{1}".format(filehash, digest.hexdigest()[:16])
+
+    def get(self, cache_key):
+        """Returns the cached replay for the key, or None."""
+        data = None
+        if cache_key in self.cache_dict:
+            self.cache_used[cache_key] = time.time()
+            data = self.cache_dict[cache_key]
+        elif self.cache_dir and os.path.exists(self.cache_path(cache_key)):
+            with open(self.cache_path(cache_key), "rb") as cache_file:
+                data = cache_file.read()
+            self._remember(cache_key, data)
+
+        if data is not None:
+            try:
+                return pickle.loads(zlib.decompress(data))
+            except Exception as e:
+                self.logger.warning(
+                    "Discarding cached replay {0}: {1}".format(cache_key, e)
+                )
+                self.discard(cache_key)
+        return None
+
+    def set(self, cache_key, replay):
+        try:
+            data = zlib.compress(pickle.dumps(replay, pickle.HIGHEST_PROTOCOL), 1)
+        except Exception as e:
+            self.logger.warning("Not caching {0}: {1}".format(replay.filename, e))
+            return
+
+        self._remember(cache_key, data)
+        if self.cache_dir:
+            # Write then rename so readers never see a partial file
+            cache_path = self.cache_path(cache_key)
+            temp_path = "{0}.{1}.tmp".format(cache_path, os.getpid())
+            with open(temp_path, "wb") as out:
+                out.write(data)
+            os.rename(temp_path, cache_path)
+
+    def discard(self, cache_key):
+        self.cache_dict.pop(cache_key, None)
+        self.cache_used.pop(cache_key, None)
+        if self.cache_dir and os.path.exists(self.cache_path(cache_key)):
+            os.remove(self.cache_path(cache_key))
+
+    def clear(self):
+        """Empties the memory cache. Cached files are left alone."""
+        self.cache_dict = dict()
+        self.cache_used = dict()
+
+    def cache_path(self, cache_key):
+        return os.path.join(self.cache_dir, cache_key + ".sc2cache")
+
+    def _remember(self, cache_key, data):
+        if not self.cache_max_size:
+            return
+        if len(self.cache_dict) >= self.cache_max_size:
+            oldest_cache_key = min(self.cache_used.items(), key=lambda e: e[1])[0]
+            del self.cache_used[oldest_cache_key]
+            del self.cache_dict[oldest_cache_key]
+        self.cache_dict[cache_key] = data
+        self.cache_used[cache_key] = time.time()
+
+    def __getstate__(self):
+        # The memory cache stays with the process, workers start empty
+        state = self.__dict__.copy()
+        state["cache_dict"] = dict()
+        state["cache_used"] = dict()
+        return state
+
+
+def _describe(value):
+    # A description of option values and plugins that doesn't change from
+    # one process to the next, unlike the default repr of most objects.
+    if isinstance(value, (list, tuple)):
+        return "[{0}]".format(",".join(_describe(item) for item in value))
+    elif isinstance(value, (set, frozenset)):
+        return "{{{0}}}".format(",".join(sorted(_describe(item) for item in value)))
+    elif isinstance(value, dict):
+        return "{{{0}}}".format(
+            ",".join(
+                sorted(
+                    "{0}:{1}".format(_describe(k), _describe(v))
+                    for k, v in value.items()
+                )
+            )
+        )
+    elif isinstance(value, (basestring, int, float, bool)) or value is None:
+        return repr(value)
+    elif hasattr(value, "__name__"):
+        return "{0}.{1}".format(getattr(value, "__module__", ""), value.__name__)
+    else:
+        cls = type(value)
+        return "{0}.{1}({2})".format(
+            cls.__module__,
+            cls.__name__,
+            ",".join(
+                "{0}={1}".format(name, _describe(setting))
+                for name, setting in _get_settings(value)
+            ),
+        )
+
+
+def _get_settings(value):
+    # Objects are described by the arguments they were made with, found on
+    # attributes of the same name as the argument, or with a leading _.
+    init = type(value).__init__
+    if init is object.__init__:
+        return []
+    try:
+        if hasattr(inspect, "getfullargspec"):
+            spec = inspect.getfullargspec(init)
+        else:
+            spec = inspect.getargspec(init)
+    except TypeError:
+        raise ValueError("can't describe {0}".format(type(value).__name__))
+
+    state = getattr(value, "__dict__", dict())
+    settings = list()
+    for name in spec.args[1:]:
+        if name in state:
+            settings.append((name, state[name]))
+        elif "_" + name in state:
+            settings.append((name, state["_" + name]))
+        else:
+            raise ValueError(
+                "can't describe the {0} setting of {1}".format(
+                    name, type(value).__name__
+                )
+            )
+    return settings
+
+
+#: The factory, resource class, options and mapper of a load_all worker
+_worker_state = None
+
+
+def _init_worker(factory, cls, options, mapper):
+    global _worker_state
+    _worker_state = (factory, cls, options, mapper)
+
+
+def _load_in_worker(source):
+    factory, cls, options, mapper = _worker_state
+    try:
+        resource, filename = factory._load_resource(source, options=options)
+        resource = factory._load(cls, resource, filename=filename, options=options)
+        return mapper(resource) if mapper else resource
+    except ReplayRejectedError as e:
+        return e
+    except Exception as e:
+        return LoadError(source, e.__class__.__name__, str(e), traceback.format_exc())
+
+
+def _scan_in_worker(source):
+    factory, cls, options, mapper = _worker_state
+    try:
+        return factory.scan_header(source, options=options)
+    except Exception as e:
+        return LoadError(source, e.__class__.__name__, str(e), traceback.format_exc())
+
+
 class CachedSC2Factory(SC2Factory):
     def get_remote_cache_key(self, remote_resource):
         # Strip the port and use the domain as the bucket
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function, unicode_literals, division
 
+from bisect import bisect_right
 import hashlib
 import math
 from collections import namedtuple
@@ -163,6 +164,22 @@ class Entity(object):
     def format(self, format_string):
         return format_string.format(**self.__dict__)
 
+    def selection_at(self, frame, control_group=10):
+        """
+        Returns the units in the control group at the end of the frame, the
+        active selection by default. Only available once the
+        :class:`~sc2reader.engine.plugins.SelectionTracker` has run with its
+        history on, raises ValueError otherwise.
+        """
+        if getattr(self, "selection_history", None) is None:
+            raise ValueError(
+                "Selection history is disabled, run the SelectionTracker with "
+                "history=True to use selection_at"
+            )
+        frames, selections = self.selection_history[control_group]
+        index = bisect_right(frames, frame) - 1
+        return selections[index] if index >= 0 else list()
+
 
 class Player(object):
     """
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, print_function, unicode_literals, division
 
+import functools
 import struct
+from collections import defaultdict, deque
 
 from sc2reader.exceptions import ParseError, ReadError
 from sc2reader.objects import *
@@ -9,12 +11,27 @@ from sc2reader.events.game import *
 from sc2reader.events.message import *
 from sc2reader.events.tracker import *
 from sc2reader.utils import DepotFile
-from sc2reader.decoders import BitPackedDecoder, ByteDecoder
+from sc2reader.decoders import BitPackedDecoder, FastBitPackedDecoder, ByteDecoder
+
+
+def get_bit_packed_decoder(data, replay, lazy_blobs=False):
+    """
+    Wraps ``data`` in the bit packed decoder selected by the ``fast_decoder``
+    load option of the replay.
+
+    Readers that never hold on to the blobs they decode can pass
+    ``lazy_blobs=True`` to get them as memoryview slices when the replay was
+    loaded with the ``lazy_blobs`` option.
+    """
+    lazy_blobs = lazy_blobs and replay.opt.get("lazy_blobs", False)
+    if replay.opt.get("fast_decoder", False):
+        return FastBitPackedDecoder(data, lazy_blobs=lazy_blobs)
+    return BitPackedDecoder(data, lazy_blobs=lazy_blobs)
 
 
 class InitDataReader(object):
     def __call__(self, data, replay):
-        data = BitPackedDecoder(data)
+        data = get_bit_packed_decoder(data, replay)
         result = dict(
             user_initial_data=[
                 dict(
@@ -316,7 +333,7 @@ class AttributesEventsReader(object):
 
 class DetailsReader(object):
     def __call__(self, data, replay):
-        details = BitPackedDecoder(data).read_struct()
+        details = get_bit_packed_decoder(data, replay).read_struct()
         return dict(
             players=[
                 dict(
@@ -365,11 +382,24 @@ class DetailsReader(object):
 
 class MessageEventsReader(object):
     def __call__(self, data, replay):
-        data = BitPackedDecoder(data)
         pings = list()
         messages = list()
         packets = list()
+        for event in self.iter_events(data, replay):
+            if isinstance(event, ChatEvent):
+                messages.append(event)
+            elif isinstance(event, PingEvent):
+                pings.append(event)
+            else:
+                packets.append(event)
 
+        return dict(pings=pings, messages=messages, packets=packets)
+
+    def iter_events(self, data, replay):
+        """
+        Yields the message events as they are decoded, in file order.
+        """
+        data = get_bit_packed_decoder(data, replay)
         frame = 0
         while not data.done():
             frame += data.read_frames()
@@ -378,17 +408,17 @@ class MessageEventsReader(object):
             if flag == 0:  # Client chat message
                 recipient = data.read_bits(3 if replay.base_build >= 21955 else 2)
                 text = data.read_aligned_string(data.read_bits(11))
-                messages.append(ChatEvent(frame, pid, recipient, text))
+                yield ChatEvent(frame, pid, recipient, text)
 
             elif flag == 1:  # Client ping message
                 recipient = data.read_bits(3 if replay.base_build >= 21955 else 2)
                 x = data.read_uint32() - 2147483648
                 y = data.read_uint32() - 2147483648
-                pings.append(PingEvent(frame, pid, recipient, x, y))
+                yield PingEvent(frame, pid, recipient, x, y)
 
             elif flag == 2:  # Loading progress message
                 progress = data.read_uint32() - 2147483648
-                packets.append(ProgressEvent(frame, pid, progress))
+                yield ProgressEvent(frame, pid, progress)
 
             elif flag == 3:  # Server ping message
                 pass
@@ -399,10 +429,68 @@ class MessageEventsReader(object):
 
             data.byte_align()
 
-        return dict(pings=pings, messages=messages, packets=packets)
+
+#: The event classes created by each of the game event factories
+GAME_EVENT_FACTORY_CLASSES = {
+    create_command_event: [
+        BasicCommandEvent,
+        TargetUnitCommandEvent,
+        TargetPointCommandEvent,
+        DataCommandEvent,
+    ],
+    create_control_group_event: [
+        SetControlGroupEvent,
+        AddToControlGroupEvent,
+        GetControlGroupEvent,
+        ControlGroupEvent,
+    ],
+}
+
+
+def get_event_type_filter(include=None, exclude=None):
+    """
+    Returns a function telling if events of a class should be kept. Event
+    types are given as classes or class names and match their subclasses.
+    """
+
+    def names(event_types):
+        return set(getattr(cls, "__name__", cls) for cls in event_types)
+
+    include = None if include is None else names(include)
+    exclude = names(exclude or [])
+
+    def is_wanted(event_class):
+        names = set(cls.__name__ for cls in event_class.__mro__)
+        if include is not None and not names & include:
+            return False
+        return not names & exclude
+
+    return is_wanted
+
+
+def filter_game_event(factory, wanted, frame, pid, data):
+    event = factory(frame, pid, data)
+    return event if type(event) in wanted else None
+
+
+def reads_like(base_parser):
+    """
+    Marks a parser override that reads exactly the same data as
+    ``base_parser`` and only builds a different event from it, so that the
+    ``skip_`` parser written for ``base_parser`` can skip it too.
+    """
+
+    def mark(parser):
+        parser.reads_like = getattr(base_parser, "__func__", base_parser)
+        return parser
+
+    return mark
 
 
 class GameEventsReader_Base(object):
+    #: The number of events read errors report when streaming events
+    error_events = 32
+
     def __init__(self):
         self.EVENT_DISPATCH = {
             0: (None, self.unknown_event),
@@ -489,17 +577,32 @@ class GameEventsReader_Base(object):
         }
 
     def __call__(self, data, replay):
-        data = BitPackedDecoder(data)
         game_events = list()
+        append = game_events.append
+        for event in self.iter_events(data, replay, game_events):
+            append(event)
+        return game_events
+
+    def iter_events(self, data, replay, game_events=None):
+        """
+        Yields the game events as they are decoded, in frame order. Read
+        errors report ``game_events`` as the events read so far. Without
+        it, when streaming, only the last :attr:`error_events` events are
+        kept to report.
+        """
+        data = get_bit_packed_decoder(data, replay)
+        recent = None
+        if game_events is None:
+            game_events = deque(maxlen=self.error_events)
+            recent = game_events.append
 
         # method short cuts, avoid dict lookups
-        EVENT_DISPATCH = self.EVENT_DISPATCH
+        EVENT_DISPATCH = self.get_event_dispatch(replay)
         debug = replay.opt["debug"]
         tell = data.tell
         read_frames = data.read_frames
         read_bits = data.read_bits
         byte_align = data.byte_align
-        append = game_events.append
 
         try:
             fstamp = 0
@@ -514,9 +617,12 @@ class GameEventsReader_Base(object):
                     event_data = event_parser(data)
                     if event_class is not None:
                         event = event_class(fstamp, pid, event_data)
-                        append(event)
-                        if debug:
-                            event.bytes = data.read_range(event_start, tell())
+                        if event is not None:
+                            if debug:
+                                event.bytes = data.read_range(event_start, tell())
+                            if recent is not None:
+                                recent(event)
+                            yield event
                     else:
                         pass  # Skipping unused events
 
@@ -529,14 +635,13 @@ class GameEventsReader_Base(object):
                         event_type,
                         event_start,
                         replay,
-                        game_events,
+                        list(game_events),
                         data,
                     )
 
                 byte_align()
                 event_start = tell()
 
-            return game_events
         except ParseError as e:
             raise ReadError(
                 "Parse error '{0}' unknown at position {1}.".format(
@@ -545,21 +650,68 @@ class GameEventsReader_Base(object):
                 event_type,
                 event_start,
                 replay,
-                game_events,
+                list(game_events),
                 data,
             )
         except EOFError as e:
             raise ReadError(
                 "EOFError error '{0}' unknown at position {1}.".format(
-                    e.msg, hex(event_start)
+                    e, hex(event_start)
                 ),
                 event_type,
                 event_start,
                 replay,
-                game_events,
+                list(game_events),
                 data,
             )
 
+    def get_event_dispatch(self, replay):
+        """
+        Returns the event dispatch table for the replay with the event types
+        filtered out by the ``game_event_types`` and ``exclude_game_event_types``
+        load options replaced by parsers that only skip over their data.
+        """
+        include = replay.opt.get("game_event_types", None)
+        exclude = replay.opt.get("exclude_game_event_types", None)
+        if include is None and not exclude:
+            return self.EVENT_DISPATCH
+
+        is_wanted = get_event_type_filter(include, exclude)
+        dispatch = dict()
+        for event_type, (event_class, event_parser) in self.EVENT_DISPATCH.items():
+            if event_class is not None:
+                classes = GAME_EVENT_FACTORY_CLASSES.get(event_class, [event_class])
+                wanted = tuple(cls for cls in classes if is_wanted(cls))
+                if not wanted:
+                    event_class = None
+                    event_parser = self.get_skip_parser(event_parser)
+                elif len(wanted) < len(classes):
+                    event_class = functools.partial(
+                        filter_game_event, event_class, wanted
+                    )
+            dispatch[event_type] = (event_class, event_parser)
+        return dispatch
+
+    def get_skip_parser(self, parser):
+        """
+        Returns the ``skip_`` version of the parser, which reads past the event
+        data without decoding it. Parsers without one are returned unchanged.
+        """
+        name = parser.__name__
+        skip_parser = getattr(self, "skip_" + name, None)
+        if skip_parser is None:
+            return parser
+
+        # A skip parser from a base class doesn't know about the data that a
+        # more recent override of the parser reads, unless the override was
+        # marked with reads_like as reading the same data as the base one.
+        mro = type(self).__mro__
+        function = getattr(parser, "__func__", parser)
+        function = getattr(function, "reads_like", function)
+        parser_owner = next(cls for cls in mro if cls.__dict__.get(name) is function)
+        skip_owner = next(cls for cls in mro if "skip_" + name in cls.__dict__)
+        return skip_parser if issubclass(skip_owner, parser_owner) else parser
+
     # Don't want to do this more than once
     SINGLE_BIT_MASKS = [0x1 << i for i in range(2**9)]
 
@@ -815,6 +967,12 @@ class GameEventsReader_15405(GameEventsReader_Base):
             reason=None,
         )
 
+    def skip_camera_update_event(self, data):
+        data.read_bits(32)
+        for i in range(3):
+            if data.read_bool():
+                data.read_bits(16)
+
     def trigger_abort_mission_event(self, data):
         return None
 
@@ -1531,6 +1689,13 @@ class GameEventsReader_HotSBeta(GameEventsReader_23260):
             yaw=data.read_uint16() if data.read_bool() else None,
         )
 
+    def skip_camera_update_event(self, data):
+        if data.read_bool():
+            data.read_bits(32)
+        for i in range(3):
+            if data.read_bool():
+                data.read_bits(16)
+
     def trigger_dialog_control_event(self, data):
         return dict(
             control_id=data.read_uint32() - 2147483648,
@@ -1610,6 +1775,7 @@ class GameEventsReader_24247(GameEventsReader_HotSBeta):
             method=data.read_bits(1),
         )
 
+    @reads_like(GameEventsReader_HotSBeta.camera_update_event)
     def camera_update_event(self, data):
         return dict(
             target=dict(x=data.read_uint16(), y=data.read_uint16())
@@ -1718,6 +1884,15 @@ class GameEventsReader_27950(GameEventsReader_26490):
             reason=data.read_uint8() - 128 if data.read_bool() else None,
         )
 
+    def skip_camera_update_event(self, data):
+        if data.read_bool():
+            data.read_bits(32)
+        for i in range(3):
+            if data.read_bool():
+                data.read_bits(16)
+        if data.read_bool():
+            data.read_bits(8)
+
     def game_user_join_event(self, data):
         return dict(
             observe=data.read_bits(2),
@@ -1822,6 +1997,9 @@ class GameEventsReader_34784(GameEventsReader_27950):
             unit_group=None,  # fill me with previous TargetPointEvent.flags
         )
 
+    def skip_command_update_target_point_event(self, data):
+        data.read_bits(72)
+
     def command_update_target_unit_event(self, data):
         return dict(
             flags=0,  # fill me with previous TargetUnitEvent.flags
@@ -1847,6 +2025,13 @@ class GameEventsReader_34784(GameEventsReader_27950):
             unit_group=None,  # fill me with previous TargetUnitEvent.flags
         )
 
+    def skip_command_update_target_unit_event(self, data):
+        data.read_bits(72)
+        for i in range(2):
+            if data.read_bool():
+                data.read_bits(4)
+        data.read_bits(72)
+
     def command_event(self, data):
         return dict(
             flags=data.read_bits(23),
@@ -1938,6 +2123,16 @@ class GameEventsReader_34784(GameEventsReader_27950):
             follow=data.read_bool(),
         )
 
+    def skip_camera_update_event(self, data):
+        if data.read_bool():
+            data.read_bits(32)
+        for i in range(3):
+            if data.read_bool():
+                data.read_bits(16)
+        if data.read_bool():
+            data.read_bits(8)
+        data.read_bool()
+
     def trigger_hotkey_pressed_event(self, data):
         return dict(hotkey=data.read_uint32(), down=data.read_bool())
 
@@ -2261,6 +2456,13 @@ class GameEventsReader_80669(GameEventsReader_65895):
 
 
 class TrackerEventsReader(object):
+    #: Compiled event data decoders for each event type, one per shape seen.
+    #: Shared by all readers, shapes only change between builds.
+    compiled_decoders = defaultdict(list)
+
+    #: Event types with more shapes than this fall back to read_struct
+    max_compiled_shapes = 8
+
     def __init__(self):
         self.EVENT_DISPATCH = {
             0: PlayerStatsEvent,
@@ -2276,17 +2478,51 @@ class TrackerEventsReader(object):
         }
 
     def __call__(self, data, replay):
-        decoder = BitPackedDecoder(data)
+        return list(self.iter_events(data, replay))
+
+    def iter_events(self, data, replay):
+        """
+        Yields the tracker events as they are decoded, in frame order.
+        """
+        decoder = get_bit_packed_decoder(data, replay, lazy_blobs=True)
 
         frames = 0
-        events = list()
         while not decoder.done():
-            decoder._buffer.read(3)  # 03 00 09
+            decoder.read_aligned_bytes(3)  # 03 00 09
             frames += decoder.read_vint()
-            decoder._buffer.read(1)  # 09
+            decoder.read_aligned_bytes(1)  # 09
             etype = decoder.read_vint()
-            event_data = decoder.read_struct()
-            event = self.EVENT_DISPATCH[etype](frames, event_data, replay.build)
-            events.append(event)
+            event_data = self.read_event_data(decoder, etype)
+            yield self.EVENT_DISPATCH[etype](frames, event_data, replay.build)
 
-        return events
+    def iter_player_stats(self, data, replay):
+        """
+        Yields ``(frame, pid, stats)`` for each :class:`PlayerStatsEvent` in
+        the tracker events without creating any events. The data of the other
+        events is read past and thrown away.
+        """
+        decoder = get_bit_packed_decoder(data, replay, lazy_blobs=True)
+
+        frames = 0
+        while not decoder.done():
+            decoder.read_aligned_bytes(3)  # 03 00 09
+            frames += decoder.read_vint()
+            decoder.read_aligned_bytes(1)  # 09
+            etype = decoder.read_vint()
+            event_data = self.read_event_data(decoder, etype)
+            if self.EVENT_DISPATCH[etype] is PlayerStatsEvent:
+                yield frames, event_data[0], event_data[1]
+
+    def read_event_data(self, decoder, etype):
+        # Use the compiled decoder for this shape of event data if there is
+        # one, the outer struct fields come back as a list instead of a dict.
+        compiled = self.compiled_decoders[etype]
+        for decode in compiled:
+            if decode is not None:
+                event_data = decoder.read_compiled_struct(decode)
+                if event_data is not None:
+                    return event_data
+
+        if len(compiled) < self.max_compiled_shapes:
+            compiled.append(decoder.compile_struct())
+        return decoder.read_struct()
@@ -3,7 +3,11 @@ from __future__ import absolute_import, print_function, unicode_literals, divisi
 
 from collections import defaultdict, namedtuple
 from datetime import datetime
+from io import BytesIO
+import copy
 import hashlib
+import mmap
+import struct
 from xml.etree import ElementTree
 import zlib
 
@@ -14,7 +18,7 @@ from sc2reader.decoders import BitPackedDecoder
 from sc2reader import log_utils
 from sc2reader import readers
 from sc2reader import exceptions
-from sc2reader.data import datapacks
+from sc2reader.data import datapacks, LazyBuild
 from sc2reader.exceptions import SC2ReaderLocalizationError, CorruptTrackerFileError
 from sc2reader.objects import (
     Participant,
@@ -27,6 +31,12 @@ from sc2reader.objects import (
     MapInfo,
 )
 from sc2reader.constants import GAME_SPEED_FACTOR, LOBBY_PROPERTIES
+from sc2reader.events.game import GameEvent
+from sc2reader.events.tracker import (
+    PlayerStatsEvent,
+    PlayerStatsTable,
+    TrackerEvent,
+)
 
 
 class Resource(object):
@@ -37,9 +47,67 @@ class Resource(object):
         self.filename = filename or getattr(file_object, "name", "Unavailable")
 
         if hasattr(file_object, "seek"):
-            file_object.seek(0)
-            self.filehash = hashlib.sha256(file_object.read()).hexdigest()
-            file_object.seek(0)
+            self.filehash = utils.get_file_hash(file_object)
+
+
+#: The version and length of a replay, see :func:`read_replay_header`
+ReplayHeader = namedtuple(
+    "ReplayHeader",
+    [
+        "filename",
+        "release_string",
+        "versions",
+        "build",
+        "base_build",
+        "frames",
+        "length",
+    ],
+)
+
+
+def read_replay_header(replay_file, filename=None):
+    """
+    :param replay_file: A replay file object, positioned at the start.
+    :param filename: The filename to put in the header, defaults to the
+        name of the file object.
+
+    Returns a :class:`ReplayHeader` decoded from the MPQ user data header at
+    the start of the replay. Only the first few hundred bytes of the file
+    are read, the MPQ archive isn't opened. Raises
+    :class:`~sc2reader.exceptions.MPQError` if the file doesn't start with a
+    user data header.
+    """
+    data = replay_file.read(16)
+    if len(data) < 16 or data[:4] != b"MPQ\x1b":
+        raise exceptions.MPQError("No MPQ user data header found")
+    header_size = struct.unpack("<I", data[12:16])[0]
+    content = replay_file.read(header_size)
+    if len(content) < header_size:
+        raise exceptions.MPQError("MPQ user data header is truncated")
+
+    filename = filename or getattr(replay_file, "name", "Unavailable")
+    return _parse_replay_header(BitPackedDecoder(content, lazy_blobs=True), filename)
+
+
+def _parse_replay_header(decoder, filename):
+    header_data = decoder.read_struct()
+    versions = list(header_data[1].values())
+    frames = header_data[3]
+    build = versions[4]
+
+    fps = 16.0
+    if 34784 <= build:  # lotv replay, adjust time
+        fps = 16.0 * 1.4
+
+    return ReplayHeader(
+        filename=filename,
+        release_string="{0}.{1}.{2}.{3}".format(*versions[1:5]),
+        versions=versions,
+        build=build,
+        base_build=versions[5],
+        frames=frames,
+        length=utils.Length(seconds=int(frames / fps)),
+    )
 
 
 class Replay(Resource):
@@ -213,6 +281,7 @@ class Replay(Resource):
         super(Replay, self).__init__(replay_file, filename, **options)
         self.datapack = None
         self.raw_data = dict()
+        self.archive = None
 
         # The current load level of the replay
         self.load_level = None
@@ -229,6 +298,7 @@ class Replay(Resource):
         self.map_hash = ""
         self.region = ""
         self.events = list()
+        self._event_index = None
         self.teams, self.team = list(), dict()
 
         self.player = dict()
@@ -252,8 +322,14 @@ class Replay(Resource):
         self.game_fps = 16.0
 
         self.tracker_events = list()
+        self.message_events = list()
         self.game_events = list()
 
+        #: True when the replay has tracker events. Set when they are loaded
+        #: and, with the stream_events option, before the engine runs, while
+        #: :attr:`tracker_events` is still empty.
+        self.has_tracker_events = False
+
         # Bootstrap the readers.
         self.registered_readers = defaultdict(list)
         self.register_default_readers()
@@ -262,6 +338,20 @@ class Replay(Resource):
         self.registered_datapacks = list()
         self.register_default_datapacks()
 
+        # Tests that the replay has to pass to keep loading, by load level
+        where = self._get_where(options.get("where", []), load_level)
+
+        # Events are either loaded below or streamed through the engine. The
+        # tests that need them run after streaming, on the kept events.
+        stream_events = engine and options.get("stream_events", False)
+        keep_events = options.get("keep_events", False)
+        if stream_events and not keep_events:
+            if any(level >= 3 and not wait for level, wait, test in where):
+                raise ValueError(
+                    "A where test needs load level 3 or 4, which streamed "
+                    "events only reach with the keep_events option"
+                )
+
         # Unpack the MPQ and read header data if requested
         # Since the underlying traceback isn't important to most people, don't expose it in python2 anymore
         if load_level >= 0:
@@ -272,19 +362,17 @@ class Replay(Resource):
                 raise exceptions.MPQError("Unable to construct the MPQArchive", e)
 
             header_content = self.archive.header["user_data_header"]["content"]
-            header_data = BitPackedDecoder(header_content).read_struct()
-            self.versions = list(header_data[1].values())
-            self.frames = header_data[3]
-            self.build = self.versions[4]
-            self.base_build = self.versions[5]
-            self.release_string = "{0}.{1}.{2}.{3}".format(*self.versions[1:5])
-            fps = self.game_fps
-            if 34784 <= self.build:  # lotv replay, adjust time
-                fps = self.game_fps * 1.4
-
-            self.length = self.game_length = self.real_length = utils.Length(
-                seconds=int(self.frames / fps)
+            header = _parse_replay_header(
+                readers.get_bit_packed_decoder(header_content, self, lazy_blobs=True),
+                self.filename,
             )
+            self.versions = header.versions
+            self.frames = header.frames
+            self.build = header.build
+            self.base_build = header.base_build
+            self.release_string = header.release_string
+            self.length = self.game_length = self.real_length = header.length
+            self._check_where(where, 0)
 
         # Load basic details if requested
         # .backup files are read in case the main files are missing or removed
@@ -305,6 +393,7 @@ class Replay(Resource):
             # Can only be effective if map data has been loaded
             if options.get("load_map", False):
                 self.load_map()
+            self._check_where(where, 1)
 
         # Load players if requested
         if load_level >= 2:
@@ -313,29 +402,49 @@ class Replay(Resource):
                 self._read_data(data_file, self._get_reader(data_file))
             self.load_message_events()
             self.load_players()
+            self._check_where(where, 2)
 
         # Load tracker events if requested
-        if load_level >= 3 and do_tracker_events:
+        if load_level >= 3 and do_tracker_events and not stream_events:
             self.load_level = 3
             for data_file in ["replay.tracker.events"]:
                 self._read_data(data_file, self._get_reader(data_file))
             self.load_tracker_events()
+            self._check_where(where, 3)
 
         # Load events if requested
-        if load_level >= 4:
+        if load_level >= 4 and not stream_events:
             self.load_level = 4
             for data_file in ["replay.game.events"]:
                 self._read_data(data_file, self._get_reader(data_file))
             self.load_game_events()
+        if not stream_events:
+            self._check_where(where, 4)
 
         # Run this replay through the engine as indicated
-        if engine:
+        if stream_events:
+            self.load_level = max(self.load_level, min(load_level, 4))
+            tracker_events = load_level >= 3 and do_tracker_events
+            if tracker_events:
+                data = self._extract_data_file("replay.tracker.events")
+                self.has_tracker_events = bool(data)
+            events = self._stream_events(tracker_events, load_level >= 4, keep_events)
+            engine.run(self, events=events)
+
+            # The engine stops pulling events once every plugin has exited,
+            # the rest are still needed for the kept events and the frames.
+            if keep_events or self.base_build == 23925:
+                for event in events:
+                    pass
+            if keep_events:
+                self._build_timeline()
+        elif engine:
             resume_events = [
                 ev for ev in self.game_events if ev.name == "HijackReplayGameEvent"
             ]
             if (
                 self.base_build <= 26490
-                and self.tracker_events
+                and self.has_tracker_events
                 and len(resume_events) > 0
             ):
                 raise CorruptTrackerFileError(
@@ -345,6 +454,50 @@ class Replay(Resource):
 
             engine.run(self)
 
+        # Tests without a load level see the replay after the engine run
+        # and so do tests of streamed events
+        self._check_where(where, load_level, after_engine=True)
+
+        if options.get("release_archive", False):
+            self.release_archive()
+
+    def _check_where(self, where, load_level, after_engine=False):
+        # Runs and removes the tests in where, which is sorted by load level,
+        # that need no more than the given load level. Tests that wait for
+        # the engine are sorted last and only run once it is done.
+        while where and where[0][0] <= load_level and (after_engine or not where[0][1]):
+            level, wait, test = where.pop(0)
+            if not test(self):
+                raise exceptions.ReplayRejectedError(
+                    "{0} rejected at load level {1}".format(self.filename, level),
+                    level,
+                )
+
+    def _get_where(self, tests, load_level):
+        where = list()
+        for test in tests:
+            level = getattr(test, "load_level", None)
+            if level is None:
+                where.append((load_level, True, test))
+            elif level > load_level:
+                raise ValueError(
+                    "A where test needs load level {0} but the replay is only "
+                    "loaded to level {1}".format(level, load_level)
+                )
+            else:
+                where.append((level, False, test))
+        return sorted(where, key=lambda item: item[:2])
+
+    def release_archive(self):
+        """
+        Lets go of the replay archive and the file contents it holds. Streams
+        that weren't loaded can't be read from the replay afterwards, so
+        :meth:`iter_events` and the like only work on the loaded streams.
+        Replays loaded with the ``release_archive`` option call this once
+        loading is done.
+        """
+        self.archive = None
+
     def load_init_data(self):
         if "replay.initData" in self.raw_data:
             initData = self.raw_data["replay.initData"]
@@ -601,7 +754,7 @@ class Replay(Resource):
         self.packets = self.raw_data["replay.message.events"]["packets"]
 
         self.message_events = self.messages + self.pings + self.packets
-        self.events = sorted(self.events + self.message_events, key=lambda e: e.frame)
+        self._build_timeline()
 
     def load_game_events(self):
         # Copy the events over
@@ -610,7 +763,7 @@ class Replay(Resource):
             return
 
         self.game_events = self.raw_data["replay.game.events"]
-        self.events = sorted(self.events + self.game_events, key=lambda e: e.frame)
+        self._build_timeline()
 
         # hideous hack for HotS 2.0.0.23925, see https://github.com/GraylinKim/sc2reader/issues/87
         if (
@@ -626,7 +779,138 @@ class Replay(Resource):
             return
 
         self.tracker_events = self.raw_data["replay.tracker.events"]
-        self.events = sorted(self.tracker_events + self.events, key=lambda e: e.frame)
+        self.has_tracker_events = bool(self.tracker_events)
+        self._build_timeline()
+
+    @property
+    def event_index(self):
+        """
+        An :class:`~sc2reader.utils.EventIndex` of :attr:`events` for looking
+        up events by type, player, or frame range. It is built on first use
+        and built again when the event list is replaced, so query it after
+        the engine plugins that set ``event.player`` have run.
+        """
+        if self._event_index is None or self._event_index.events is not self.events:
+            self._event_index = utils.EventIndex(self.events)
+        return self._event_index
+
+    def player_stats_table(self, use_numpy=True):
+        """
+        Returns a :class:`~sc2reader.events.tracker.PlayerStatsTable` with the
+        player stats of the replay in columns by pid. Unless the tracker
+        events are already loaded, the stats are decoded straight from the
+        archive into the columns and no events are created.
+
+        :param use_numpy: Return the columns as numpy arrays when numpy is
+            installed instead of :class:`array.array`.
+        """
+        table = PlayerStatsTable(self.build)
+        if "replay.tracker.events" in self.raw_data:
+            for event in self.tracker_events:
+                if isinstance(event, PlayerStatsEvent):
+                    table.add(event.frame, event.pid, event.stats)
+        else:
+            data = self._extract_data_file("replay.tracker.events")
+            if data:
+                reader = self._get_reader("replay.tracker.events")
+                for frame, pid, stats in reader.iter_player_stats(data, self):
+                    table.add(frame, pid, stats)
+
+        if use_numpy:
+            try:
+                table.to_numpy()
+            except ImportError:
+                pass
+        return table
+
+    def iter_events(self):
+        """
+        Yields the tracker, message and game events of the replay merged in
+        frame order, the same order as :attr:`events`. Event streams that
+        haven't been loaded are decoded from the archive as they are
+        consumed and the events aren't kept, so a single pass over a replay
+        loaded with ``load_level=2`` holds only a handful of events at a time.
+        """
+        return utils.merge_timeline(
+            self.iter_tracker_events(),
+            self.iter_message_events(),
+            self.iter_game_events(),
+            window=self.frame_order_window,
+        )
+
+    def iter_tracker_events(self):
+        """
+        Yields the tracker events of the replay in the order they are stored,
+        decoding them from the archive unless they have already been loaded.
+        """
+        if "replay.tracker.events" in self.raw_data:
+            return iter(self.tracker_events)
+        return self._iter_data("replay.tracker.events")
+
+    def iter_game_events(self):
+        """
+        Yields the game events of the replay in the order they are stored,
+        decoding them from the archive unless they have already been loaded.
+        """
+        if "replay.game.events" in self.raw_data:
+            return iter(self.game_events)
+        return self._iter_data("replay.game.events")
+
+    def iter_message_events(self):
+        """
+        Yields the message events of the replay in frame order. There are
+        few enough of them that they are always read in one go.
+        """
+        if "replay.message.events" in self.raw_data:
+            message_events = self.message_events
+        else:
+            data = self._extract_data_file("replay.message.events")
+            if not data:
+                return iter([])
+            data = self._get_reader("replay.message.events")(data, self)
+            message_events = data["messages"] + data["pings"] + data["packets"]
+        return iter(sorted(message_events, key=lambda e: e.frame))
+
+    def _stream_events(self, tracker_events, game_events, keep_events):
+        # The events the engine runs over with the stream_events option. The
+        # streams are decoded as the engine pulls events from them and the
+        # events pulled are only kept on the replay if keep_events is set.
+        streams = [self.iter_message_events()]
+        if tracker_events:
+            streams.insert(0, self._iter_data("replay.tracker.events"))
+        if game_events:
+            streams.append(self._iter_data("replay.game.events"))
+
+        # Resumed games can't be found before their game events are decoded,
+        # so the check on old tracker streams is made as they come up.
+        check_resume = self.base_build <= 26490 and self.has_tracker_events
+        frame = 0
+        for event in utils.merge_timeline(*streams, window=self.frame_order_window):
+            if isinstance(event, TrackerEvent):
+                if keep_events:
+                    self.tracker_events.append(event)
+            elif isinstance(event, GameEvent):
+                if check_resume and event.name == "HijackReplayGameEvent":
+                    raise CorruptTrackerFileError(
+                        "Cannot run engine on resumed games with tracker events. Run again with the "
+                        + "do_tracker_events=False option to generate context without tracker events."
+                    )
+                if keep_events:
+                    self.game_events.append(event)
+            frame = event.frame
+            yield event
+
+        # All of the events were pulled, so the kept streams are complete
+        if keep_events:
+            if tracker_events:
+                self.raw_data["replay.tracker.events"] = self.tracker_events
+            if game_events:
+                self.raw_data["replay.game.events"] = self.game_events
+
+        # hideous hack for HotS 2.0.0.23925, as in load_game_events
+        if self.base_build == 23925 and game_events and frame > self.frames:
+            self.frames = frame
+            self.length = utils.Length(seconds=int(self.frames / self.game_fps))
 
     def register_reader(self, data_file, reader, filterfunc=lambda r: True):
         """
@@ -789,91 +1073,91 @@ class Replay(Resource):
     def register_default_datapacks(self):
         """Registers factory default datapacks."""
         self.register_datapack(
-            datapacks["WoL"]["16117"],
+            datapacks["WoL"].lazy("16117"),
             lambda r: r.expansion == "WoL" and 16117 <= r.build < 17326,
         )
         self.register_datapack(
-            datapacks["WoL"]["17326"],
+            datapacks["WoL"].lazy("17326"),
             lambda r: r.expansion == "WoL" and 17326 <= r.build < 18092,
         )
         self.register_datapack(
-            datapacks["WoL"]["18092"],
+            datapacks["WoL"].lazy("18092"),
             lambda r: r.expansion == "WoL" and 18092 <= r.build < 19458,
         )
         self.register_datapack(
-            datapacks["WoL"]["19458"],
+            datapacks["WoL"].lazy("19458"),
             lambda r: r.expansion == "WoL" and 19458 <= r.build < 22612,
         )
         self.register_datapack(
-            datapacks["WoL"]["22612"],
+            datapacks["WoL"].lazy("22612"),
             lambda r: r.expansion == "WoL" and 22612 <= r.build < 24944,
         )
         self.register_datapack(
-            datapacks["WoL"]["24944"],
+            datapacks["WoL"].lazy("24944"),
             lambda r: r.expansion == "WoL" and 24944 <= r.build,
         )
         self.register_datapack(
-            datapacks["HotS"]["base"],
+            datapacks["HotS"].lazy("base"),
             lambda r: r.expansion == "HotS" and r.build < 23925,
         )
         self.register_datapack(
-            datapacks["HotS"]["23925"],
+            datapacks["HotS"].lazy("23925"),
             lambda r: r.expansion == "HotS" and 23925 <= r.build < 24247,
         )
         self.register_datapack(
-            datapacks["HotS"]["24247"],
+            datapacks["HotS"].lazy("24247"),
             lambda r: r.expansion == "HotS" and 24247 <= r.build < 24764,
         )
         self.register_datapack(
-            datapacks["HotS"]["24764"],
+            datapacks["HotS"].lazy("24764"),
             lambda r: r.expansion == "HotS" and 24764 <= r.build < 38215,
         )
         self.register_datapack(
-            datapacks["HotS"]["38215"],
+            datapacks["HotS"].lazy("38215"),
             lambda r: r.expansion == "HotS" and 38215 <= r.build,
         )
         self.register_datapack(
-            datapacks["LotV"]["base"],
+            datapacks["LotV"].lazy("base"),
             lambda r: r.expansion == "LotV" and 34784 <= r.build,
         )
         self.register_datapack(
-            datapacks["LotV"]["44401"],
+            datapacks["LotV"].lazy("44401"),
             lambda r: r.expansion == "LotV" and 44401 <= r.build < 47185,
         )
         self.register_datapack(
-            datapacks["LotV"]["47185"],
+            datapacks["LotV"].lazy("47185"),
             lambda r: r.expansion == "LotV" and 47185 <= r.build < 48258,
         )
         self.register_datapack(
-            datapacks["LotV"]["48258"],
+            datapacks["LotV"].lazy("48258"),
             lambda r: r.expansion == "LotV" and 48258 <= r.build < 53644,
         )
         self.register_datapack(
-            datapacks["LotV"]["53644"],
+            datapacks["LotV"].lazy("53644"),
             lambda r: r.expansion == "LotV" and 53644 <= r.build < 54724,
         )
         self.register_datapack(
-            datapacks["LotV"]["54724"],
+            datapacks["LotV"].lazy("54724"),
             lambda r: r.expansion == "LotV" and 54724 <= r.build < 59587,
         )
         self.register_datapack(
-            datapacks["LotV"]["59587"],
+            datapacks["LotV"].lazy("59587"),
             lambda r: r.expansion == "LotV" and 59587 <= r.build < 70154,
         )
         self.register_datapack(
-            datapacks["LotV"]["70154"],
+            datapacks["LotV"].lazy("70154"),
             lambda r: r.expansion == "LotV" and 70154 <= r.build < 76114,
         )
         self.register_datapack(
-            datapacks["LotV"]["76114"],
+            datapacks["LotV"].lazy("76114"),
             lambda r: r.expansion == "LotV" and 76114 <= r.build < 77379,
         )
         self.register_datapack(
-            datapacks["LotV"]["77379"],
+            datapacks["LotV"].lazy("77379"),
             lambda r: r.expansion == "LotV" and 77379 <= r.build < 80949,
         )
         self.register_datapack(
-            datapacks["LotV"]["80949"],
+            datapacks["LotV"].lazy("80949"),
             lambda r: r.expansion == "LotV" and 80949 <= r.build,
         )
 
@@ -889,15 +1173,32 @@ class Replay(Resource):
                 )
             )
 
+    def _build_timeline(self):
+        # The loaded streams are merged again from scratch rather than into
+        # the current timeline, so loading them in any order gives the same
+        # tracker, message, game order for events on the same frame.
+        self.events = utils.build_timeline(
+            self.tracker_events, self.message_events, self.game_events
+        )
+
     def _get_datapack(self):
         for callback, datapack in self.registered_datapacks:
             if callback(self):
+                if isinstance(datapack, LazyBuild):
+                    datapack = datapack.load()
                 return datapack
         else:
             return None
 
+    def _extract_data_file(self, data_file):
+        if self.archive is None:
+            raise ValueError(
+                "Can't read {0}, the replay archive was released".format(data_file)
+            )
+        return utils.extract_data_file(data_file, self.archive)
+
     def _read_data(self, data_file, reader):
-        data = utils.extract_data_file(data_file, self.archive)
+        data = self._extract_data_file(data_file)
         if data:
             self.raw_data[data_file] = reader(data, self)
         elif self.opt["debug"] and data_file not in [
@@ -906,12 +1207,56 @@ class Replay(Resource):
         ]:
             raise ValueError("{0} not found in archive".format(data_file))
 
+    def _iter_data(self, data_file):
+        data = self._extract_data_file(data_file)
+        if not data:
+            return iter([])
+        return self._get_reader(data_file).iter_events(data, self)
+
+    #: How far back in a stream an event can be and still be put in frame
+    #: order by :meth:`iter_events`. Some early tracker streams have events
+    #: a few places out of order.
+    frame_order_window = 1024
+
     def __getstate__(self):
         state = self.__dict__.copy()
         del state["registered_readers"]
         del state["registered_datapacks"]
+
+        # The factory that loaded the replay isn't part of it
+        del state["factory"]
+
+        # Loggers hold locks that Python 2 can't pickle
+        del state["logger"]
+        state["_event_index"] = None
+        state["opt"] = dict(self.opt)
+        state["opt"].pop("where", None)
+        if self.archive is not None and isinstance(
+            self.archive.file, (mmap.mmap, BytesIO)
+        ):
+            # Memory maps can't be pickled and BytesIO only can from pickle
+            # protocol 2, send a copy of the contents as bytes instead
+            archive = copy.copy(self.archive)
+            archive.file = None
+            state["archive"] = archive
+            if isinstance(self.archive.file, BytesIO):
+                state["_archive_contents"] = self.archive.file.getvalue()
+            else:
+                state["_archive_contents"] = self.archive.file[:]
         return state
 
+    def __setstate__(self, state):
+        contents = state.pop("_archive_contents", None)
+        if contents is not None:
+            state["archive"].file = BytesIO(contents)
+        self.__dict__.update(state)
+        self.logger = log_utils.get_logger(self.__class__)
+        self.factory = None
+        self.registered_readers = defaultdict(list)
+        self.register_default_readers()
+        self.registered_datapacks = list()
+        self.register_default_datapacks()
+
 
 class Map(Resource):
     def __init__(self, map_file, filename=None, region=None, map_hash=None, **options):
@@ -1344,29 +1689,31 @@ class GameSummary(Resource):
             build_order.sort(key=lambda x: x.build_index)
 
     def load_players(self):
-        for index, struct in enumerate(self.parts[0][3]):
-            if not struct[0] or not struct[0][1]:
+        for index, player_data in enumerate(self.parts[0][3]):
+            if not player_data[0] or not player_data[0][1]:
                 continue  # Slot is closed
 
-            player = PlayerSummary(struct[0][0])
+            player = PlayerSummary(player_data[0][0])
             stats = self.player_stats.get(index, dict())
             settings = self.player_settings[index]
-            player.is_ai = not isinstance(struct[0][1], dict)
+            player.is_ai = not isinstance(player_data[0][1], dict)
             if not player.is_ai:
                 player.region = self.region
-                player.subregion = struct[0][1][0][2]
-                player.bnetid = struct[0][1][0][3]
-                player.unknown1 = struct[0][1][0]
-                player.unknown2 = struct[0][1][1]
+                player.subregion = player_data[0][1][0][2]
+                player.bnetid = player_data[0][1][0][3]
+                player.unknown1 = player_data[0][1][0]
+                player.unknown2 = player_data[0][1][1]
 
             # Either a referee or a spectator, nothing else to do
             if settings.get("Participant Role", "") != "Participant":
                 self.observers.append(player)
                 continue
 
-            player.play_race = LOBBY_PROPERTIES[0xBB9][1].get(struct[2], None)
+            player.play_race = LOBBY_PROPERTIES[0xBB9][1].get(player_data[2], None)
 
-            player.is_winner = isinstance(struct[1], dict) and struct[1][0] == 0
+            player.is_winner = (
+                isinstance(player_data[1], dict) and player_data[1][0] == 0
+            )
             if player.is_winner:
                 self.winners.append(player.pid)
 
@@ -49,7 +49,7 @@ def main():
         print("dealing with {0}".format(folder))
         for path in sc2reader.utils.get_files(folder, extension="SC2Replay"):
             try:
-                rs = sc2reader.load_replay(path, load_level=0).release_string
+                rs = sc2reader.scan_header(path).release_string
                 already_did = rs in releases_parsed
                 releases_parsed.add(rs)
                 if not args.one_each or not already_did:
@@ -71,8 +71,9 @@ def main():
                         ability_pids = set(
                             [
                                 event.player.pid
-                                for event in replay.events
-                                if "CommandEvent" in event.name
+                                for event in replay.event_index.events_of_type(
+                                    "CommandEvent"
+                                )
                             ]
                         )
                         if human_pids != event_pids:
@@ -2,7 +2,12 @@
 from __future__ import absolute_import, print_function, unicode_literals, division
 
 import binascii
+import bisect
+import hashlib
+import heapq
+import itertools
 import os
+import operator
 import json
 from datetime import timedelta, datetime
 
@@ -41,6 +46,145 @@ class DepotFile(object):
         return self.url
 
 
+def decode_blob(blob, encoding="utf8"):
+    """
+    Decodes a blob read with :meth:`~sc2reader.decoders.BitPackedDecoder.read_struct`.
+    Blobs are memoryview slices when the decoder was created with ``lazy_blobs``.
+    """
+    if isinstance(blob, memoryview):
+        blob = blob.tobytes()
+    return blob.decode(encoding)
+
+
+def merge_timeline(*streams, **options):
+    """
+    :param streams: Iterables of events, each in frame order.
+    :param window: The number of events a stream can be out of frame order
+        by. Defaults to 0 for streams that are sorted.
+
+    Lazily merges event streams into a single stream in frame order. Events
+    on the same frame come in the order of the streams they are from and
+    then in their order within their stream, the order a stable sort of the
+    streams put end to end gives. Only the current event of each stream and
+    the ``window`` events after it are held at a time.
+    """
+    window = options.get("window", 0)
+    decorated = [_frame_order(events, i, window) for i, events in enumerate(streams)]
+    for frame, stream, index, event in heapq.merge(*decorated):
+        yield event
+
+
+def _frame_order(events, stream, window):
+    # Sort keys for merging streams, ties go to the earlier stream and
+    # then to the earlier event so events are never compared directly.
+    pending = list()
+    for index, event in enumerate(events):
+        heapq.heappush(pending, (event.frame, stream, index, event))
+        if len(pending) > window:
+            yield heapq.heappop(pending)
+    while pending:
+        yield heapq.heappop(pending)
+
+
+def build_timeline(*streams):
+    """
+    :param streams: Lists of events.
+
+    Returns a list of the events of all streams in frame order, with the
+    same tie order as :func:`merge_timeline`. It is a stable sort of the
+    streams put end to end, which merges streams that are already in frame
+    order in a single pass.
+    """
+    return sorted(itertools.chain(*streams), key=operator.attrgetter("frame"))
+
+
+class EventIndex(object):
+    """
+    :param events: A list of events in frame order, such as
+        :attr:`~sc2reader.resources.Replay.events`.
+
+    Groups the events by type and by player so they can be looked up without
+    scanning the whole list. Each group keeps the events in the order of the
+    original list. The index doesn't follow changes to the list it was built
+    from; build a new one after adding or removing events.
+    """
+
+    def __init__(self, events):
+        #: The list of events that was indexed
+        self.events = events
+
+        #: The frame of each event, for bisecting
+        self.frames = [event.frame for event in events]
+
+        self._by_type = dict()
+        self._by_player = dict()
+        filed_under = dict()
+        for event in events:
+            # Events are filed under their own class and every base class so
+            # that asking for CommandEvent also finds TargetPointCommandEvent.
+            cls = event.__class__
+            groups = filed_under.get(cls)
+            if groups is None:
+                groups = filed_under[cls] = [
+                    self._by_type.setdefault(base, list()) for base in cls.__mro__[:-1]
+                ]
+            for group in groups:
+                group.append(event)
+
+            player = getattr(event, "player", None)
+            if player is not None:
+                self._by_player.setdefault(player, list()).append(event)
+
+        # Names are looked up through the classes with that name, different
+        # classes can share a name, such as events of different plugins.
+        self._types_named = dict()
+        self._by_shared_name = dict()
+        for cls in self._by_type:
+            self._types_named.setdefault(cls.__name__, list()).append(cls)
+
+    def events_of_type(self, event_type):
+        """
+        :param event_type: An event class or class name, for example
+            ``CommandEvent`` or ``"TrackerEvent"``.
+
+        Returns a list of the events that are instances of the type,
+        including instances of its subclasses. A name finds the events of
+        every class with that name. The list is shared by later calls and
+        shouldn't be modified.
+        """
+        if isinstance(event_type, type):
+            return self._by_type.get(event_type, [])
+
+        types = self._types_named.get(event_type)
+        if not types:
+            return []
+        elif len(types) == 1:
+            return self._by_type[types[0]]
+        elif event_type not in self._by_shared_name:
+            # Events of all the classes with the name, in the original order
+            self._by_shared_name[event_type] = [
+                event for event in self.events if isinstance(event, tuple(types))
+            ]
+        return self._by_shared_name[event_type]
+
+    def events_for_player(self, player):
+        """
+        :param player: A :class:`~sc2reader.objects.Entity`, typically
+            from :attr:`~sc2reader.resources.Replay.player`.
+
+        Returns a list of the events whose ``player`` is the given entity.
+        """
+        return self._by_player.get(player, [])
+
+    def events_between(self, start_frame, end_frame):
+        """
+        Returns a list of the events with ``start_frame <= frame < end_frame``.
+        """
+        start = bisect.bisect_left(self.frames, start_frame)
+        end = bisect.bisect_left(self.frames, end_frame, start)
+        return self.events[start:end]
+
+
 def windows_to_unix(windows_time):
     # This windows timestamp measures the number of 100 nanosecond periods since
     # January 1st, 1601. First we subtract the number of nanosecond periods from
@@ -111,6 +255,22 @@ def get_real_type(teams):
         return "v".join(str(size) for size in sorted(team_sizes))
 
 
+def get_file_hash(file_object, chunk_size=1 << 20):
+    """
+    Returns the sha256 hex digest of the contents of a seekable file object.
+    The file is read in chunks so that memory mapped files aren't copied
+    into memory whole. The file is left at the start.
+    """
+    file_object.seek(0)
+    digest = hashlib.sha256()
+    chunk = file_object.read(chunk_size)
+    while chunk:
+        digest.update(chunk)
+        chunk = file_object.read(chunk_size)
+    file_object.seek(0)
+    return digest.hexdigest()
+
+
 def extract_data_file(data_file, archive):
     def recovery_attempt():
         try:
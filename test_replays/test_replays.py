@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import copy
 import datetime
+import io
 import json
+import os
+import pickle
+import shutil
+import tempfile
 from xml.dom import minidom
 
 # Newer unittest features aren't built in for python 2.6
@@ -19,8 +25,8 @@ except ImportError:
     from io import StringIO
 
 import sc2reader
-from sc2reader.exceptions import CorruptTrackerFileError
-from sc2reader.events.game import GameEvent
+from sc2reader.exceptions import CorruptTrackerFileError, ReadError
+from sc2reader.events.game import CommandEvent, GameEvent, PlayerLeaveEvent
 from sc2reader.objects import Player
 
 sc2reader.log_utils.log_to_console("INFO")
@@ -374,6 +380,41 @@ class TestReplays(unittest.TestCase):
         self.assertEqual(code, 0)
         self.assertEqual(details, dict())
 
+    def test_unit_lifecycle_plugin(self):
+        from sc2reader.engine.plugins import ContextLoader, UnitLifecycleTracker
+        from sc2reader.engine.plugins.lifecycle import UnitTable
+
+        replay = sc2reader.load_replay(
+            "test_replays/lotv/lotv1.SC2Replay",
+            engine=sc2reader.engine.GameEngine(
+                plugins=[ContextLoader(), UnitLifecycleTracker(use_numpy=False)]
+            ),
+        )
+        table = replay.unit_table
+        columns = table.columns
+        type_names = table.type_names()
+        self.assertEqual(len(table), len(replay.objects) - 1)
+        for unit_id, row in table.rows.items():
+            unit = replay.objects[unit_id]
+            self.assertEqual(columns["unit_id"][row], unit_id)
+            self.assertEqual(type_names[row], unit._type_class.str_id)
+            self.assertEqual(
+                max(columns["born_frame"][row], columns["init_frame"][row]),
+                unit.started_at,
+            )
+            self.assertEqual(columns["died_frame"][row], unit.died_at or -1)
+            if unit.owner:
+                self.assertEqual(columns["owner"][row], unit.owner.pid)
+
+        # Built from the tracker events alone, without the engine
+        replay = sc2reader.load_replay(
+            "test_replays/lotv/lotv1.SC2Replay", load_level=2
+        )
+        standalone = UnitTable()
+        standalone.add_events(replay.iter_tracker_events())
+        self.assertEqual(standalone.columns, columns)
+        self.assertEqual(standalone.unit_types, table.unit_types)
+
     @unittest.expectedFailure
     def test_factory_plugins(self):
         from sc2reader.factories.plugins.replay import (
@@ -753,6 +794,806 @@ class TestReplays(unittest.TestCase):
             event._str_prefix(),
         )
 
+    def test_fast_decoder(self):
+        for filename in [
+            "test_replays/2.0.8.25604/issue136.SC2Replay",
+            "test_replays/lotv/lotv1.SC2Replay",
+        ]:
+            classic = sc2reader.load_replay(filename, engine=None)
+            fast = sc2reader.load_replay(filename, engine=None, fast_decoder=True)
+            self.assertEqual(classic.raw_data.keys(), fast.raw_data.keys())
+            self.assertEqual(len(classic.events), len(fast.events))
+            for a, b in zip(classic.events, fast.events):
+                self.assertEqual(type(a), type(b))
+                self.assertEqual(a.frame, b.frame)
+                self.assertEqual(a.name, b.name)
+
+    def test_lazy_blobs(self):
+        from sc2reader.decoders import BitPackedDecoder, FastBitPackedDecoder
+
+        filename = "test_replays/lotv/lotv1.SC2Replay"
+        classic = sc2reader.load_replay(filename)
+        details = classic.archive.read_file("replay.details")
+        expected = BitPackedDecoder(details).read_struct()
+        for decoder in [BitPackedDecoder, FastBitPackedDecoder]:
+            struct = decoder(details, lazy_blobs=True).read_struct()
+            self.assertTrue(isinstance(struct[1], memoryview))
+            self.assertEqual(struct[1].tobytes(), expected[1])
+            self.assertEqual(struct[0][0][0].tobytes(), expected[0][0][0])
+
+        replay = sc2reader.load_replay(filename, lazy_blobs=True)
+        self.assertEqual(
+            [
+                e.unit_type_name
+                for e in replay.tracker_events
+                if hasattr(e, "unit_type_name")
+            ],
+            [
+                e.unit_type_name
+                for e in classic.tracker_events
+                if hasattr(e, "unit_type_name")
+            ],
+        )
+
+    def test_compiled_tracker_events(self):
+        from sc2reader.readers import TrackerEventsReader
+
+        replay = sc2reader.load_replay(
+            "test_replays/lotv/lotv1.SC2Replay", load_level=1
+        )
+        data = replay.archive.read_file("replay.tracker.events")
+        reader = TrackerEventsReader()
+        reader.max_compiled_shapes = 0
+        expected = reader(data, replay)
+        reader.max_compiled_shapes = 8
+        for i in range(2):
+            events = reader(data, replay)
+            self.assertEqual(len(events), len(expected))
+            for a, b in zip(events, expected):
+                self.assertEqual(type(a), type(b))
+                self.assertEqual(event_values(a), event_values(b))
+        self.assertTrue(any(TrackerEventsReader.compiled_decoders.values()))
+
+    def test_iter_events(self):
+        filename = "test_replays/2.1.3.28667/Habitation Station LE (54).SC2Replay"
+        full = sc2reader.load_replay(filename, engine=None)
+        expected = [(e.name, e.frame) for e in full.events]
+        self.assertEqual([(e.name, e.frame) for e in full.iter_events()], expected)
+
+        # Events that weren't loaded are decoded on the fly and not kept
+        replay = sc2reader.load_replay(filename, load_level=1)
+        self.assertEqual([(e.name, e.frame) for e in replay.iter_events()], expected)
+        self.assertEqual(len(list(replay.iter_game_events())), len(full.game_events))
+        self.assertEqual(replay.events, [])
+        self.assertFalse("replay.game.events" in replay.raw_data)
+
+        # Read errors while streaming report the last events decoded
+        reader = copy.copy(replay._get_reader("replay.game.events"))
+        reader.EVENT_DISPATCH = dict(
+            (event_type, entry)
+            for event_type, entry in reader.EVENT_DISPATCH.items()
+            if entry[0] is not PlayerLeaveEvent
+        )
+        data = replay.archive.read_file("replay.game.events")
+        events = list()
+        with self.assertRaises(ReadError) as context:
+            for event in reader.iter_events(data, replay):
+                events.append(event)
+        self.assertTrue(len(events) > reader.error_events)
+        self.assertEqual(context.exception.game_events, events[-reader.error_events :])
+
+    def test_timeline(self):
+        from sc2reader.utils import build_timeline, merge_timeline
+
+        filename = "test_replays/lotv/lotv1.SC2Replay"
+        replay = sc2reader.load_replay(filename, engine=None)
+        streams = [replay.tracker_events, replay.message_events, replay.game_events]
+        expected = sorted(
+            replay.tracker_events + replay.message_events + replay.game_events,
+            key=lambda e: e.frame,
+        )
+        self.assertEqual(replay.events, expected)
+        self.assertEqual(build_timeline(*streams), expected)
+
+        # Message events are only in frame order within each kind of message
+        streams[1] = list(replay.iter_message_events())
+        self.assertEqual(list(merge_timeline(*streams)), expected)
+
+        # Ties go to the earlier stream, then the earlier event
+        class TestEvent(object):
+            def __init__(self, frame):
+                self.frame = frame
+
+        a, b, c, d = TestEvent(1), TestEvent(1), TestEvent(0), TestEvent(1)
+        self.assertEqual(list(merge_timeline([a, b], [c, d])), [c, a, b, d])
+        self.assertEqual(build_timeline([a, b], [c, d]), [c, a, b, d])
+        self.assertEqual(list(merge_timeline([a, c], [d], window=1)), [c, a, d])
+
+    def test_event_index(self):
+        from sc2reader.events.tracker import TrackerEvent
+
+        replay = sc2reader.load_replay("test_replays/lotv/lotv1.SC2Replay")
+        index = replay.event_index
+        self.assertTrue(replay.event_index is index)
+
+        commands = [e for e in replay.events if isinstance(e, CommandEvent)]
+        self.assertTrue(commands)
+        self.assertEqual(index.events_of_type(CommandEvent), commands)
+        self.assertEqual(index.events_of_type("CommandEvent"), commands)
+        self.assertEqual(
+            index.events_of_type(TrackerEvent),
+            [e for e in replay.events if isinstance(e, TrackerEvent)],
+        )
+        self.assertEqual(index.events_of_type("NoSuchEvent"), [])
+
+        player = replay.players[0]
+        self.assertEqual(
+            index.events_for_player(player),
+            [e for e in replay.events if getattr(e, "player", None) is player],
+        )
+
+        self.assertEqual(
+            index.events_between(1000, 2000),
+            [e for e in replay.events if 1000 <= e.frame < 2000],
+        )
+        self.assertEqual(index.events_between(0, replay.frames + 1), replay.events)
+
+        replay.load_tracker_events()
+        self.assertFalse(replay.event_index is index)
+
+        # Classes that share a name are kept apart
+        def make_event_class():
+            class SharedEvent(object):
+                def __init__(self, frame):
+                    self.frame = frame
+
+            return SharedEvent
+
+        first, second = make_event_class(), make_event_class()
+        a, b, c = first(0), second(1), first(2)
+        index = sc2reader.utils.EventIndex([a, b, c])
+        self.assertEqual(index.events_of_type(first), [a, c])
+        self.assertEqual(index.events_of_type(second), [b])
+        self.assertEqual(index.events_of_type("SharedEvent"), [a, b, c])
+
+    def test_scan_header(self):
+        from sc2reader.exceptions import LoadError, MPQError
+
+        paths = [
+            "test_replays/lotv/lotv1.SC2Replay",
+            "test_replays/1.2.2.17811/1.SC2Replay",
+        ]
+        for path in paths:
+            header = sc2reader.scan_header(path)
+            replay = sc2reader.load_replay(path, load_level=0)
+            self.assertEqual(header.filename, path)
+            self.assertEqual(header.release_string, replay.release_string)
+            self.assertEqual(header.versions, replay.versions)
+            self.assertEqual(header.build, replay.build)
+            self.assertEqual(header.base_build, replay.base_build)
+            self.assertEqual(header.frames, replay.frames)
+            self.assertEqual(header.length, replay.length)
+
+        headers = list(sc2reader.scan_replays(paths))
+        self.assertEqual(headers, [sc2reader.scan_header(path) for path in paths])
+        self.assertEqual(list(sc2reader.scan_replays(paths, workers=2)), headers)
+
+        bad_path = "test_replays/test_replays.py"
+        self.assertRaises(MPQError, sc2reader.scan_header, bad_path)
+        result = list(sc2reader.scan_replays([bad_path], workers=1))[0]
+        self.assertTrue(isinstance(result, LoadError))
+        self.assertRaises(MPQError, list, sc2reader.scan_replays([bad_path]))
+
+    def test_load_replays_where(self):
+        from sc2reader.engine.plugins import APMTracker, ContextLoader
+        from sc2reader.exceptions import ReplayRejectedError
+        from sc2reader.factories import ReplayFilter, filters
+
+        paths = [
+            "test_replays/1.2.2.17811/1.SC2Replay",
+            "test_replays/lotv/lotv1.SC2Replay",
+            "test_replays/4.7.0.70154/1.SC2Replay",
+        ]
+        factory = sc2reader.factories.SC2Factory()
+        replays = [factory.load_replay(path, load_level=2) for path in paths]
+
+        seen = list()
+        where = [
+            ReplayFilter(2, lambda replay: seen.append(replay.filename) or True),
+            filters.build_range(min_build=30000),
+        ]
+        loaded = list(factory.load_replays(paths, load_level=2, where=where))
+        self.assertEqual(
+            [r.filename for r in loaded],
+            [r.filename for r in replays if r.build >= 30000],
+        )
+        self.assertEqual(seen, [r.filename for r in loaded])
+        self.assertEqual(dict(factory.rejected), {0: len(paths) - len(loaded)})
+
+        map_name = replays[1].map_name
+        loaded = list(
+            factory.load_replays(
+                paths, load_level=2, where=[filters.map_name(map_name)], workers=2
+            )
+        )
+        self.assertEqual([r.map_name for r in loaded], [map_name])
+        self.assertEqual(dict(factory.rejected), {1: len(paths) - 1})
+
+        self.assertRaises(
+            ReplayRejectedError,
+            factory.load_replay,
+            paths[0],
+            load_level=2,
+            where=[filters.has_player("Nobody")],
+        )
+        self.assertRaises(
+            ValueError,
+            factory.load_replay,
+            paths[0],
+            load_level=1,
+            where=[filters.ladder()],
+        )
+
+        # Tests without a load level run after the engine plugins
+        engine = sc2reader.engine.GameEngine(plugins=[ContextLoader(), APMTracker()])
+        where = [lambda replay: all(human.avg_apm > 0 for human in replay.humans)]
+        loaded = list(factory.load_replays(paths[1:], engine=engine, where=where))
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(dict(factory.rejected), {})
+
+    def test_memory_map(self):
+        path = "test_replays/lotv/lotv1.SC2Replay"
+        replay = sc2reader.load_replay(path, load_level=3)
+        mapped = sc2reader.load_replay(path, load_level=3, memory_map=True)
+        self.assertEqual(mapped.filename, path)
+        self.assertEqual(mapped.filehash, replay.filehash)
+        self.assertEqual(
+            [e.frame for e in mapped.events], [e.frame for e in replay.events]
+        )
+
+        # The memory map is swapped for a copy of the contents when pickled
+        unpickled = pickle.loads(pickle.dumps(mapped))
+        self.assertEqual(
+            len(list(unpickled.iter_game_events())),
+            len(list(replay.iter_game_events())),
+        )
+
+        released = sc2reader.load_replay(
+            path, load_level=3, memory_map=True, release_archive=True
+        )
+        self.assertTrue(released.archive is None)
+        self.assertEqual(len(released.tracker_events), len(replay.tracker_events))
+        self.assertEqual(
+            len(list(released.iter_tracker_events())), len(replay.tracker_events)
+        )
+        self.assertRaises(ValueError, released.iter_game_events)
+
+    def test_stream_events(self):
+        from sc2reader.exceptions import ReplayRejectedError
+        from sc2reader.factories import ReplayFilter
+
+        path = "test_replays/lotv/lotv1.SC2Replay"
+        replay = sc2reader.load_replay(path)
+        streamed = sc2reader.load_replay(path, stream_events=True)
+        self.assertEqual(streamed.load_level, 4)
+        self.assertEqual(streamed.tracker_events, [])
+        self.assertEqual(streamed.game_events, [])
+        self.assertEqual(len(streamed.events), len(replay.message_events))
+        self.assertEqual(len(streamed.objects), len(replay.objects))
+        self.assertEqual(
+            [(p.pid, len(p.units), len(p.events)) for p in streamed.players],
+            [(p.pid, len(p.units), len(p.events)) for p in replay.players],
+        )
+        self.assertEqual(streamed.plugin_result, replay.plugin_result)
+
+        kept = sc2reader.load_replay(path, stream_events=True, keep_events=True)
+        self.assertEqual(
+            [(e.frame, e.name) for e in kept.events],
+            [(e.frame, e.name) for e in replay.events],
+        )
+        self.assertEqual(len(list(kept.iter_game_events())), len(replay.game_events))
+
+        # Tests of the events run once they have been streamed and kept
+        has_tracker_events = ReplayFilter(3, lambda r: len(r.tracker_events) > 0)
+        kept = sc2reader.load_replay(
+            path, stream_events=True, keep_events=True, where=[has_tracker_events]
+        )
+        self.assertEqual(len(kept.tracker_events), len(replay.tracker_events))
+        self.assertRaises(
+            ReplayRejectedError,
+            sc2reader.load_replay,
+            path,
+            stream_events=True,
+            keep_events=True,
+            where=[ReplayFilter(4, lambda r: len(r.game_events) == 0)],
+        )
+        self.assertRaises(
+            ValueError,
+            sc2reader.load_replay,
+            path,
+            stream_events=True,
+            where=[has_tracker_events],
+        )
+
+        # Plugins can tell there are tracker events before they are streamed
+        self.assertTrue(replay.has_tracker_events)
+        self.assertTrue(streamed.has_tracker_events)
+        self.assertFalse(sc2reader.load_replay(path, load_level=2).has_tracker_events)
+
+        # The rest of the events are kept when every plugin exits early
+        class EarlyExit(object):
+            name = "EarlyExit"
+
+            def handleInitGame(self, event, replay):
+                yield sc2reader.engine.PluginExit(self, code=0, details=dict())
+
+        kept = sc2reader.load_replay(
+            path,
+            stream_events=True,
+            keep_events=True,
+            engine=sc2reader.engine.GameEngine(plugins=[EarlyExit()]),
+        )
+        self.assertEqual(
+            [(e.frame, e.name) for e in kept.events],
+            [(e.frame, e.name) for e in replay.events],
+        )
+        self.assertTrue(kept.raw_data["replay.game.events"] is kept.game_events)
+
+    def test_stream_events_context(self):
+        from sc2reader.engine.plugins import ContextLoader, GameHeartNormalizer
+
+        def type_histories(replay):
+            return sorted(
+                (unit.id, [(frame, t.name) for frame, t in unit.type_history.items()])
+                for unit in replay.objects.values()
+            )
+
+        for path in [
+            "test_replays/2.0.10.26490/replay26490.SC2Replay",
+            "test_replays/2.0.11.26825/DaedalusPoint.SC2Replay",
+            "test_replays/2.0.8.25446/ggtracker_3024127.SC2Replay",
+            "test_replays/gameheart/gameheart.SC2Replay",
+        ]:
+            engine = sc2reader.engine.GameEngine(
+                plugins=[GameHeartNormalizer(), ContextLoader()]
+            )
+            replay = sc2reader.load_replay(path, engine=engine)
+            streamed = sc2reader.load_replay(
+                path, engine=engine, stream_events=True, keep_events=True
+            )
+            self.assertEqual(type_histories(streamed), type_histories(replay))
+            self.assertEqual(streamed.frames, replay.frames)
+            self.assertEqual(
+                [p.name for p in streamed.observers], [p.name for p in replay.observers]
+            )
+            self.assertEqual(
+                sorted((e.frame, e.name) for e in streamed.events),
+                sorted((e.frame, e.name) for e in replay.events),
+            )
+            self.assertEqual(streamed.plugin_result, replay.plugin_result)
+
+    def test_engine_seek(self):
+        from sc2reader.engine.plugins import ContextLoader, SelectionTracker
+        from sc2reader.engine.utils import EngineCheckpoints
+
+        def state(replay):
+            units = sorted(
+                (unit.id, unit.owner and unit.owner.pid, unit.died_at)
+                for unit in replay.objects.values()
+            )
+            selections = [
+                (player.pid, [[u.id for u in s] for s in player.selection.values()])
+                for player in replay.players
+            ]
+            return units, sorted(replay.active_units), selections
+
+        path = "test_replays/lotv/lotv1.SC2Replay"
+        engine = sc2reader.engine.GameEngine(
+            plugins=[ContextLoader(), SelectionTracker()], checkpoint_frames=2000
+        )
+        replay = sc2reader.load_replay(path, engine=engine)
+        checkpoints = replay.engine_checkpoints
+        self.assertEqual(
+            [c.frame // 2000 for c in checkpoints],
+            list(range(replay.frames // 2000 + 1)),
+        )
+
+        frame = replay.frames // 2 + 1
+        expected = sc2reader.load_replay(path, engine=None)
+        engine.seek(expected, frame, EngineCheckpoints(2000))
+        engine.seek(replay, frame)
+        self.assertEqual(state(replay), state(expected))
+
+        saved = io.BytesIO()
+        checkpoints.save(saved)
+        saved.seek(0)
+        loaded = sc2reader.load_replay(path, engine=None)
+        engine.seek(loaded, frame, EngineCheckpoints.load(saved))
+        self.assertEqual(state(loaded), state(expected))
+
+        other = sc2reader.engine.GameEngine(plugins=[ContextLoader()])
+        self.assertRaises(ValueError, other.seek, loaded, frame, checkpoints)
+
+    def test_selection_at(self):
+        from sc2reader.engine.plugins import ContextLoader, SelectionTracker
+
+        class SelectionRecorder(object):
+            name = "SelectionRecorder"
+
+            def __init__(self):
+                self.selections = dict()
+
+            def handleSelectionEvent(self, event, replay):
+                for control_group in (event.control_group, 10):
+                    key = (event.player.pid, event.frame, control_group)
+                    self.selections[key] = event.player.selection[control_group]
+
+            handleControlGroupEvent = handleSelectionEvent
+
+        recorder = SelectionRecorder()
+        replay = sc2reader.load_replay(
+            "test_replays/1.3.2.18317/4v4_Outpost_10788.SC2Replay",
+            engine=sc2reader.engine.GameEngine(
+                plugins=[ContextLoader(), SelectionTracker(), recorder]
+            ),
+        )
+        self.assertTrue(recorder.selections)
+        for (pid, frame, control_group), selection in recorder.selections.items():
+            player = replay.player[pid]
+            self.assertEqual(player.selection_at(frame, control_group), selection)
+        for player in replay.players:
+            for control_group, selection in player.selection.items():
+                self.assertEqual(
+                    player.selection_at(replay.frames, control_group), selection
+                )
+                self.assertEqual(player.selection_at(-1, control_group), [])
+
+        replay = sc2reader.load_replay(
+            "test_replays/1.3.2.18317/4v4_Outpost_10788.SC2Replay",
+            engine=sc2reader.engine.GameEngine(
+                plugins=[ContextLoader(), SelectionTracker(history=False)]
+            ),
+        )
+        self.assertRaises(ValueError, replay.players[0].selection_at, 0)
+
+    def test_player_stats_table(self):
+        from sc2reader.events.tracker import PlayerStatsEvent, PlayerStatsTable
+
+        replay = sc2reader.load_replay(
+            "test_replays/lotv/lotv1.SC2Replay", load_level=2
+        )
+        table = replay.player_stats_table(use_numpy=False)
+        self.assertEqual(len(table.names), 40)
+
+        replay = sc2reader.load_replay("test_replays/lotv/lotv1.SC2Replay")
+        stats_events = [
+            e for e in replay.tracker_events if isinstance(e, PlayerStatsEvent)
+        ]
+        self.assertEqual(
+            sorted(table.players), sorted(set(e.pid for e in stats_events))
+        )
+        for pid, columns in table.players.items():
+            events = [e for e in stats_events if e.pid == pid]
+            for name in table.names:
+                self.assertEqual(
+                    list(columns[name]), [getattr(e, name) for e in events]
+                )
+
+        frames = table.columns(1)["frame"]
+        self.assertEqual(table.index_at(1, frames[0] - 1), -1)
+        self.assertEqual(table.index_at(1, frames[2]), 2)
+        self.assertEqual(table.index_at(1, frames[2] + 1), 2)
+        self.assertEqual(table.columns(99), {})
+
+        # Loaded tracker events are reused rather than decoded again
+        loaded = replay.player_stats_table(use_numpy=False)
+        self.assertEqual(loaded.players, table.players)
+
+        # Stats read straight from the archive have the frames of the events
+        reader = replay._get_reader("replay.tracker.events")
+        data = replay._extract_data_file("replay.tracker.events")
+        self.assertEqual(
+            [
+                (frame % 2**32, pid)
+                for frame, pid, stats in reader.iter_player_stats(data, replay)
+            ],
+            [(e.frame, e.pid) for e in stats_events],
+        )
+        streamed = PlayerStatsTable(replay.build)
+        for frame, pid, stats in reader.iter_player_stats(data, replay):
+            streamed.add(frame, pid, stats)
+        self.assertEqual(streamed.players, loaded.players)
+        streamed.add(2**32 + 16, 1, stats_events[0].stats)
+        self.assertEqual(streamed.columns(1)["frame"][-1], 16)
+
+    def test_game_event_types(self):
+        from sc2reader.events.game import CameraEvent, CommandEvent
+
+        for filename in [
+            "test_replays/2.0.8.25604/mlg1.SC2Replay",
+            "test_replays/lotv/lotv1.SC2Replay",
+        ]:
+            full = sc2reader.load_replay(filename, engine=None)
+            replay = sc2reader.load_replay(
+                filename, engine=None, exclude_game_event_types=[CameraEvent]
+            )
+            self.assertEqual(
+                [(e.name, e.frame) for e in replay.game_events],
+                [
+                    (e.name, e.frame)
+                    for e in full.game_events
+                    if e.name != "CameraEvent"
+                ],
+            )
+
+            # Camera updates are skipped without being decoded
+            reader = replay._get_reader("replay.game.events")
+            self.assertEqual(
+                reader.get_skip_parser(reader.camera_update_event),
+                reader.skip_camera_update_event,
+            )
+
+        replay = sc2reader.load_replay(
+            filename, engine=None, game_event_types=["CommandEvent"]
+        )
+        self.assertEqual(
+            [(e.name, e.frame) for e in replay.game_events],
+            [
+                (e.name, e.frame)
+                for e in full.game_events
+                if isinstance(e, CommandEvent)
+            ],
+        )
+
+    def test_parallel_load_replays(self):
+        from operator import attrgetter
+        from sc2reader.exceptions import LoadError
+
+        filenames = [
+            "test_replays/lotv/lotv1.SC2Replay",
+            "test_replays/lotv/lotv2.SC2Replay",
+            "test_replays/2.0.8.25604/mlg1.SC2Replay",
+        ]
+        mapper = attrgetter("filename", "map_name", "frames")
+        expected = list(sc2reader.load_replays(filenames, mapper=mapper))
+        self.assertEqual([summary[0] for summary in expected], filenames)
+
+        summaries = sc2reader.load_replays(filenames, workers=2, mapper=mapper)
+        self.assertEqual(list(summaries), expected)
+        summaries = sc2reader.load_replays(
+            filenames, workers=2, ordered=False, chunksize=2, mapper=mapper
+        )
+        self.assertEqual(sorted(summaries), sorted(expected))
+
+        replays = list(
+            sc2reader.load_replays(
+                filenames[:1] + ["test_replays/not_a_replay.SC2Replay"], workers=2
+            )
+        )
+        self.assertEqual(replays[0].frames, expected[0][2])
+        self.assertEqual(len(replays[0].players), 2)
+        self.assertTrue(isinstance(replays[1], LoadError))
+        self.assertEqual(replays[1].source, "test_replays/not_a_replay.SC2Replay")
+
+        # Loading serially still raises on the bad file
+        serial = sc2reader.load_replays(
+            filenames[:1] + ["test_replays/not_a_replay.SC2Replay"], mapper=mapper
+        )
+        self.assertEqual(next(serial), expected[0])
+        self.assertRaises(IOError, next, serial)
+
+    def test_engine_run_many(self):
+        from sc2reader.engine.plugins import APMTracker, ContextLoader
+        from sc2reader.exceptions import LoadError
+
+        filenames = [
+            "test_replays/lotv/lotv1.SC2Replay",
+            "test_replays/lotv/lotv2.SC2Replay",
+            "test_replays/2.0.8.25604/mlg1.SC2Replay",
+        ]
+        expected = list()
+        for filename in filenames:
+            replay = sc2reader.load_replay(
+                filename,
+                engine=sc2reader.engine.GameEngine(
+                    plugins=[ContextLoader(), APMTracker()]
+                ),
+            )
+            expected.extend(human.avg_apm for human in replay.humans)
+
+        apm = APMTracker()
+        engine = sc2reader.engine.GameEngine(plugins=[ContextLoader(), apm])
+        results = engine.run_many(filenames)
+        self.assertEqual(apm.batch_avg_apm, expected)
+        self.assertEqual(results, [dict(ContextLoader=(0, {}), APMTracker=(0, {}))] * 3)
+
+        # Loaded replays are run again
+        replays = [sc2reader.load_replay(filenames[0], engine=None)]
+        engine.run_many(replays)
+        self.assertEqual(apm.batch_avg_apm, expected[:2])
+
+        # Runs outside a batch aren't collected
+        engine.run(replays[0])
+        self.assertEqual(apm.batch_avg_apm, expected[:2])
+
+        results = engine.run_many(
+            filenames + ["test_replays/not_a_replay.SC2Replay"],
+            workers=2,
+            chunksize=2,
+        )
+        self.assertEqual(apm.batch_avg_apm, expected)
+        self.assertTrue(isinstance(results[3], LoadError))
+        self.assertRaises(
+            IOError,
+            engine.run_many,
+            filenames[:1] + ["test_replays/not_a_replay.SC2Replay"],
+        )
+        self.assertFalse(apm.in_batch)
+
+        # Sources are loaded with the given factory
+        factory = sc2reader.factories.SC2Factory()
+        factory.configure(directory="test_replays/lotv")
+        for workers in (None, 2):
+            results = engine.run_many(
+                ["lotv1.SC2Replay"], workers=workers, factory=factory
+            )
+            self.assertEqual(results, [dict(ContextLoader=(0, {}), APMTracker=(0, {}))])
+            self.assertEqual(apm.batch_avg_apm, expected[:2])
+
+    def test_parsed_replay_cache(self):
+        from sc2reader.factories import ParsedReplayCache
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            factory = sc2reader.factories.SC2Factory()
+            factory.use_parsed_cache(ParsedReplayCache(cache_dir, cache_max_size=1))
+            filename = "test_replays/lotv/lotv1.SC2Replay"
+            replay = factory.load_replay(filename)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            cached = factory.load_replay(filename)
+            self.assertFalse(cached is replay)
+            self.assertEqual(cached.filehash, replay.filehash)
+            self.assertEqual(len(cached.events), len(replay.events))
+            self.assertEqual(
+                [str(player) for player in cached.players],
+                [str(player) for player in replay.players],
+            )
+            self.assertTrue(cached._get_reader("replay.details") is not None)
+
+            # Loaded from the file system once the memory cache is gone
+            factory.parsed_cache.clear()
+            cached = factory.load_replay(filename)
+            self.assertEqual(len(cached.events), len(replay.events))
+
+            # Different options are cached separately
+            cached = factory.load_replay(filename, load_level=1)
+            self.assertEqual(cached.load_level, 1)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+            self.assertTrue(cached.factory is factory)
+            self.assertEqual(pickle.loads(pickle.dumps(replay)).factory, None)
+
+            # Engine and plugin settings are part of the key
+            cache = factory.parsed_cache
+            with open(filename, "rb") as replay_file:
+                resource = io.BytesIO(replay_file.read())
+            from sc2reader.engine.plugins import SelectionTracker
+
+            keys = set(
+                cache.get_key(resource, dict(engine=engine), [])
+                for engine in [
+                    sc2reader.engine.GameEngine(plugins=[SelectionTracker()]),
+                    sc2reader.engine.GameEngine(
+                        plugins=[SelectionTracker(history=False)]
+                    ),
+                    sc2reader.engine.GameEngine(
+                        plugins=[SelectionTracker()], profile=True
+                    ),
+                    sc2reader.engine.GameEngine(
+                        plugins=[SelectionTracker()], checkpoint_frames=960
+                    ),
+                ]
+            )
+            self.assertEqual(len(keys), 4)
+
+            # Replays aren't cached when a setting can't be described
+            class Untracked(object):
+                def __init__(self, setting):
+                    pass
+
+            engine = sc2reader.engine.GameEngine(plugins=[Untracked(1)])
+            self.assertEqual(cache.get_key(resource, dict(engine=engine), []), None)
+
+            # The package files are only hashed once per process
+            fingerprint = ParsedReplayCache.get_fingerprint()
+            self.assertTrue(ParsedReplayCache.get_fingerprint() is fingerprint)
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_lazy_datapacks(self):
+        import sc2reader.data
+
+        replay = sc2reader.load_replay(
+            "test_replays/lotv/lotv1.SC2Replay", load_level=1
+        )
+        self.assertTrue(replay.datapack is sc2reader.data.datapacks["LotV"]["base"])
+        self.assertEqual(replay.datapack.id, "base")
+        self.assertEqual(sc2reader.data.datapacks["HotS"]["38215"].id, "38215")
+        self.assertTrue("80949" in sc2reader.data.datapacks["LotV"])
+
+        # The precompiled tables match the ones read from the data files
+        unit_data, abil_data = sc2reader.data.get_build_data("LotV", "80949")
+        digest = sc2reader.data.get_build_digest(unit_data, abil_data)
+        compiled = sc2reader.data.get_compiled_tables("LotV", "80949", digest)
+        self.assertEqual(
+            compiled, sc2reader.data.parse_build_tables(unit_data, abil_data)
+        )
+        self.assertEqual(
+            sc2reader.data.get_compiled_tables("LotV", "80949", "outdated"), None
+        )
+
+        # The compiled file is only read once
+        compiled_builds = sc2reader.data.get_compiled_builds()
+        self.assertTrue(sc2reader.data.get_compiled_builds() is compiled_builds)
+
+    def test_shared_datapack_types(self):
+        import sc2reader.data
+
+        old, new = (
+            sc2reader.data.datapacks["LotV"]["53644"],
+            sc2reader.data.datapacks["LotV"]["54724"],
+        )
+        shared = [
+            ability_id
+            for ability_id, ability in new.abilities.items()
+            if old.abilities.get(ability_id) is ability
+        ]
+        self.assertTrue(len(shared) > 600)
+        for ability_id in old.abilities:
+            if ability_id in new.abilities and ability_id not in shared:
+                self.assertNotEqual(
+                    vars(old.abilities[ability_id]), vars(new.abilities[ability_id])
+                )
+
+        # Lookups through the build work as before
+        unit = new.create_unit(1, "Marine", 0)
+        self.assertTrue(unit._type_class is new.units["Marine"])
+        self.assertEqual(unit._type_class.id, new.Marine.id)
+
+    def test_event_slots(self):
+        replay = sc2reader.load_replay("test_replays/lotv/lotv1.SC2Replay")
+        for event in replay.events:
+            self.assertEqual(event.name, event.__class__.__name__)
+            self.assertEqual(vars(event), {})
+
+        command = next(e for e in replay.events if isinstance(e, CommandEvent))
+        self.assertEqual(len(command.flag), 22)
+        self.assertEqual(command.flag["user"], command.flags & 0x100 != 0)
+        self.assertEqual(dict(command.flag)["smart_click"], command.flags & 0x8 != 0)
+
+        # Plugins can still attach their own attributes
+        command.plugin_data = 1
+        self.assertEqual(vars(command), dict(plugin_data=1))
+        self.assertEqual(event_values(command)["ability_id"], command.ability_id)
+
+        # Events pickle at every protocol, Python 2 defaults to protocol 0
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            unpickled = pickle.loads(pickle.dumps(command, protocol))
+            self.assertEqual(vars(unpickled), dict(plugin_data=1))
+            self.assertEqual(unpickled.ability_id, command.ability_id)
+            self.assertEqual(unpickled.flags, command.flags)
+            self.assertEqual(unpickled.frame, command.frame)
+
+
+def event_values(event):
+    """Returns the slot and dict attributes of an event"""
+    values = dict(vars(event))
+    for cls in type(event).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if name != "__dict__" and hasattr(event, name):
+                values[name] = getattr(event, name)
+    return values
+
 
 class TestGameEngine(unittest.TestCase):
     class TestEvent(object):
@@ -812,6 +1653,100 @@ class TestGameEngine(unittest.TestCase):
         self.assertEqual(replay.plugin_result["TestPlugin1"], (1, dict(msg="Fail!")))
         self.assertEqual(replay.plugin_result["TestPlugin2"], (0, dict()))
 
+    def test_handler_tables_are_reused(self):
+        engine = sc2reader.engine.GameEngine()
+        engine.register_plugin(self.TestPlugin1())
+        engine.register_plugin(self.TestPlugin2())
+        for i in range(3):
+            replay = self.MockReplay([self.TestEvent("a")])
+            engine.run(replay)
+            self.assertEqual("".join(str(e) for e in replay.engine_events), "bdecaf")
+            self.assertEqual(replay.plugin_failures, ["TestPlugin1"])
+
+        # One table for both plugins and one for after TestPlugin1 exits
+        self.assertEqual(len(engine._handler_tables), 2)
+        engine.register_plugin(self.TestPlugin2())
+        self.assertEqual(len(engine._handler_tables), 0)
+
+    def test_run_over_events(self):
+        pulled = list()
+
+        def events():
+            for value in "ah":
+                pulled.append(value)
+                yield self.TestEvent(value)
+
+        engine = sc2reader.engine.GameEngine(plugins=[self.TestPlugin1()])
+        replay = self.MockReplay([])
+        engine.run(replay, events=events())
+        self.assertEqual(replay.plugin_failures, ["TestPlugin1"])
+
+        # The only plugin exits handling its own events from InitGame, so
+        # none of the events are pulled
+        self.assertEqual(pulled, [])
+
+    def test_profile(self):
+        from sc2reader.engine.utils import PluginProfile
+
+        engine = sc2reader.engine.GameEngine(
+            plugins=[self.TestPlugin1(), self.TestPlugin2()], profile=True
+        )
+        total = PluginProfile()
+        for i in range(2):
+            replay = self.MockReplay([self.TestEvent("a")])
+            engine.run(replay)
+            total.merge(replay.plugin_profile)
+
+        profile = replay.plugin_profile
+        self.assertEqual(
+            sorted(profile["TestPlugin1"]),
+            ["handleInitGame", "handleTestEvent"],
+        )
+        init = profile["TestPlugin1"]["handleInitGame"]
+        self.assertEqual((init.calls, init.yielded), (1, 2))
+        test_event = profile["TestPlugin2"]["handleTestEvent"]
+        self.assertEqual(test_event.calls, 6)
+        self.assertTrue(test_event.max_time <= test_event.total_time)
+        self.assertEqual(profile["TestPlugin2"]["handleEndGame"].yielded, 1)
+
+        self.assertEqual(total["TestPlugin2"]["handleTestEvent"].calls, 12)
+        totals = total.plugin_totals()
+        self.assertEqual(
+            totals["TestPlugin2"].calls,
+            sum(stats.calls for stats in total["TestPlugin2"].values()),
+        )
+
+        replay = self.MockReplay([self.TestEvent("a")])
+        sc2reader.engine.GameEngine(plugins=[self.TestPlugin2()]).run(replay)
+        self.assertFalse(hasattr(replay, "plugin_profile"))
+
+    def test_unhandled_events_are_skipped(self):
+        class BornCounter(object):
+            name = "BornCounter"
+
+            def handleInitGame(self, event, replay):
+                replay.born = 0
+
+            def handleUnitBornEvent(self, event, replay):
+                replay.born += 1
+                yield TestGameEngine.TestEvent("born")
+
+            def handleTestEvent(self, event, replay):
+                replay.test_events = getattr(replay, "test_events", 0) + 1
+
+        replay = sc2reader.load_replay(
+            "test_replays/lotv/lotv1.SC2Replay", load_level=3, engine=None
+        )
+        engine = sc2reader.engine.GameEngine(plugins=[BornCounter()])
+        engine.run(replay)
+        born = len([e for e in replay.events if e.name == "UnitBornEvent"])
+        self.assertEqual(replay.born, born)
+        self.assertEqual(replay.test_events, born)
+        self.assertEqual(replay.plugins, {"BornCounter": (0, dict())})
+
+        handlers = list(engine._handler_tables.values())[0][1]
+        self.assertEqual(handlers[sc2reader.events.tracker.PlayerStatsEvent], [])
+
 
 class MockPlayer(object):
     def __init__(self):